@@ -8,6 +8,19 @@
 #define SIG_PC 'S'
 char dump;
 
+// Define protocol 2: framed, pipelined setpoints (see Python controller/serial_protocol.py)
+// frame: 0xAA 0x55 | seq | count | period_us (uint16) | count setpoints | CRC-16/CCITT
+// answer: 'K' | last accepted seq | free slots, or 'N' | expected seq | free slots, then the CRC-16/CCITT of these 3 bytes
+#define SIG_PC_V2 'P'
+#define ACK_V2 'K'
+#define NAK_V2 'N'
+#define FRAME_HEADER_1 0xAA
+#define FRAME_HEADER_2 0x55
+#define SETPOINT_BYTES ((JOINT_NUM+1)*2) //"+1" here means the gripper command
+#define MAX_BATCH 4 // setpoints per frame, a frame stays below the 64 byte RX buffer
+#define RING_SIZE 32 // setpoints buffered for playback
+bool protocol_v2 = false;
+
 // Define state machine for serial communication
 enum serial_states{IDLE, INIT, READY, STREAM, TIMEOUT};
 enum serial_states serial_state;
@@ -98,8 +111,170 @@ Adafruit_PWMServoDriver pwm = Adafruit_PWMServoDriver();
 // uint8_t servonum = 0;
 
 //data array that store the Joint pose
-uint16_t joint_poses[JOINT_NUM];
-unsigned char buff[JOINT_NUM*2]; //raw data receive from serial port
+uint16_t joint_poses[JOINT_NUM+1]; //"+1" here means the gripper command
+unsigned char buff[SETPOINT_BYTES]; //raw data receive from serial port
+
+// protocol 2 ring buffer of the setpoints waiting for playback
+uint16_t ring[RING_SIZE][JOINT_NUM+1];
+uint8_t ring_head = 0; // next setpoint to play
+uint8_t ring_count = 0;
+uint8_t expected_seq = 0;
+unsigned long playback_period_us = 33333;
+unsigned long last_playback_us = 0;
+
+// protocol 2 frame parser, frame_buff holds seq, count, period, the setpoints and the CRC
+enum parser_states{WAIT_HEADER_1, WAIT_HEADER_2, READ_FRAME};
+enum parser_states parser_state = WAIT_HEADER_1;
+unsigned char frame_buff[4 + MAX_BATCH*SETPOINT_BYTES + 2];
+uint8_t frame_pos = 0;
+uint8_t frame_len = 0;
+
+uint16_t crc16_update(uint16_t crc, uint8_t data)
+{
+  crc ^= ((uint16_t)data) << 8u;
+  for(int i = 0; i < 8; i++)
+  {
+    crc = (crc & 0x8000) ? ((crc << 1u) ^ 0x1021) : (crc << 1u);
+  }
+  return crc;
+}
+
+void protocol_v2_respond(char kind, uint8_t seq)
+{
+  uint8_t answer[5];
+  answer[0] = kind;
+  answer[1] = seq;
+  answer[2] = RING_SIZE - ring_count;
+  uint16_t crc = 0xFFFF;
+  for(int i = 0; i < 3; i++)
+  {
+    crc = crc16_update(crc, answer[i]);
+  }
+  answer[3] = crc >> 8u;
+  answer[4] = crc & 0xFF;
+  Serial.write(answer, 5);
+}
+
+void protocol_v2_reset()
+{
+  ring_head = 0;
+  ring_count = 0;
+  expected_seq = 0;
+  parser_state = WAIT_HEADER_1;
+}
+
+// check a complete frame and queue its setpoints
+void protocol_v2_handle_frame()
+{
+  uint16_t crc = 0xFFFF;
+  for(int i = 0; i < frame_len - 2; i++)
+  {
+    crc = crc16_update(crc, frame_buff[i]);
+  }
+  uint16_t received_crc = (((uint16_t)frame_buff[frame_len-2]) << 8u) | (uint16_t)frame_buff[frame_len-1];
+  uint8_t seq = frame_buff[0];
+  uint8_t count = frame_buff[1];
+
+  if(crc != received_crc)
+  {
+    protocol_v2_respond(NAK_V2, expected_seq);
+    return;
+  }
+  // a status poll, or a resent frame that was queued already
+  if(count == 0 || (uint8_t)(expected_seq - seq - 1) < 128)
+  {
+    protocol_v2_respond(ACK_V2, expected_seq - 1);
+    return;
+  }
+  // a frame went missing before this one, or it does not fit
+  if(seq != expected_seq || count > RING_SIZE - ring_count)
+  {
+    protocol_v2_respond(NAK_V2, expected_seq);
+    return;
+  }
+
+  if(ring_count == 0)
+  {
+    // play the first setpoint right away
+    last_playback_us = micros() - playback_period_us;
+  }
+  playback_period_us = (((uint16_t)frame_buff[2]) << 8u) | (uint16_t)frame_buff[3];
+  for(int k = 0; k < count; k++)
+  {
+    uint8_t slot = (ring_head + ring_count) % RING_SIZE;
+    unsigned char *setpoint = &frame_buff[4 + k*SETPOINT_BYTES];
+    for(int i = 0; i < (JOINT_NUM+1); i++)
+    {
+      ring[slot][i] = ((((uint16_t)(setpoint[2*i])) << 8u) | (uint16_t)(setpoint[2*i+1]));
+    }
+    ring_count++;
+  }
+  expected_seq++;
+  protocol_v2_respond(ACK_V2, seq);
+}
+
+// feed the parser with every received byte, never waits for a whole frame
+void protocol_v2_receive()
+{
+  while(Serial.available() > 0)
+  {
+    uint8_t c = Serial.read();
+    switch(parser_state)
+    {
+      case WAIT_HEADER_1:
+        if(c == FRAME_HEADER_1) parser_state = WAIT_HEADER_2;
+        break;
+      case WAIT_HEADER_2:
+        if(c == FRAME_HEADER_2)
+        {
+          parser_state = READ_FRAME;
+          frame_pos = 0;
+          frame_len = 4;
+        }
+        else if(c != FRAME_HEADER_1)
+        {
+          parser_state = WAIT_HEADER_1;
+        }
+        break;
+      case READ_FRAME:
+        frame_buff[frame_pos++] = c;
+        if(frame_pos == 2)
+        {
+          // the count byte sets the frame length
+          if(c > MAX_BATCH)
+          {
+            protocol_v2_respond(NAK_V2, expected_seq);
+            parser_state = WAIT_HEADER_1;
+            break;
+          }
+          frame_len = 4 + c*SETPOINT_BYTES + 2;
+        }
+        if(frame_pos == frame_len)
+        {
+          protocol_v2_handle_frame();
+          parser_state = WAIT_HEADER_1;
+        }
+        break;
+    }
+  }
+}
+
+// update the servos with the next buffered setpoint once per playback period
+// when the buffer runs empty the servos hold the last setpoint
+void protocol_v2_playback()
+{
+  if(ring_count == 0 || micros() - last_playback_us < playback_period_us)
+  {
+    return;
+  }
+  last_playback_us += playback_period_us;
+  for(int i = 0; i < (JOINT_NUM+1); i++)
+  {
+    pwm.setPWM(i, 0, ring[ring_head][i]);
+  }
+  ring_head = (ring_head + 1) % RING_SIZE;
+  ring_count--;
+}
 
 void timer_setup(){
   cli();                      //stop interrupts for till we make the settings
@@ -238,6 +413,8 @@ void loop() {
       }
       //flush the output buffer
       Serial.flush();
+      // forget the setpoints and frames of the last connection
+      protocol_v2_reset();
       // disable the timer
       timer_dis();
       // reset the timer counter
@@ -253,10 +430,12 @@ void loop() {
       // polling for the signal byte
       if (Serial.available())
       {
-        if(Serial.read() == SIG_PC)
+        char pc_signal = Serial.read();
+        if(pc_signal == SIG_PC)
         {
           // set the signal flag
           PC_signal_flag = true;
+          protocol_v2 = false;
           // send out acknowledge byte when receive the signal
           Serial.print(ACK_UNO);
           // enable timer interrupt
@@ -264,6 +443,13 @@ void loop() {
           // enable timer
           // timer_en();
         }
+        else if(pc_signal == SIG_PC_V2)
+        {
+          PC_signal_flag = true;
+          protocol_v2 = true;
+          // report the empty ring buffer, nothing accepted yet
+          protocol_v2_respond(ACK_V2, expected_seq - 1);
+        }
       }
       
       break;
@@ -275,6 +461,14 @@ void loop() {
       // data format: each joint position is a uint16, will be sent in two bytes,
       // format will be JP1_H,JP1_L...., unit: length count(I don't want arduino to handle floating point number)
 
+      if(protocol_v2)
+      {
+        // protocol 2 parses the frames as the bytes arrive and plays the buffered setpoints
+        protocol_v2_receive();
+        protocol_v2_playback();
+        break;
+      }
+
       while(Serial.available() < (JOINT_NUM+1)*2) //"+1" here means the gripper command
       {
         //wait
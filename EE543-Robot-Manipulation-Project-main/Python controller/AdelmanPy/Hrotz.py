@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-from AdelmanPy.rotz import rotz
+from .rotz import rotz
 
 def Hrotz (psi: float) -> np.ndarray:
     """
@@ -11,13 +11,15 @@ def Hrotz (psi: float) -> np.ndarray:
     corresponding to a rotation of 'psi' radians about the Z-axis. The
     translation components are set to zero.
 
-    Version: 3.0.0
+    Version: 3.2.0
 
     Args:
-        psi (float): The rotation angle in radians.
+        psi (float or np.ndarray): The rotation angle in radians, or an
+            array of angles of any shape.
 
     Returns:
-        np.ndarray: A 4x4 array representing the homogeneous rotation matrix.
+        np.ndarray: A 4x4 array representing the homogeneous rotation matrix,
+            or a (..., 4, 4) stack of them for an array of angles.
 
     Example:
         >>> import numpy as np
@@ -52,13 +54,20 @@ def Hrotz (psi: float) -> np.ndarray:
     Author: Ian Adelman
     Email: IanAdelman@outlook.com
     Created: 2022
-    Revised: 2025-01-25
-    Version: 3.1.0
+    Revised: 2026-10-18
+    Version: 3.2.0
 
     Version Notes:
+        3.2.0 (2026-10-18): Vectorized, accepts arrays of angles of any
+                            shape and returns a (..., 4, 4) stack
         3.1.0 (2025-01-25): Translated function to python
         3.0.0 (2024-11-14): Made variable names and format consistent 
         2.0.0 (2023-03-18): Updated function header, improved code readability
     """
 
-    return np.block([[rotz(psi), np.zeros((3,1))], [np.zeros((1,3)), 1]])
\ No newline at end of file
+    psi = np.asarray(psi, dtype=float)
+    HTM = np.zeros(psi.shape + (4, 4))
+    HTM[..., :3, :3] = rotz(psi)
+    HTM[..., 3, 3] = 1
+
+    return HTM
\ No newline at end of file
@@ -1,10 +1,73 @@
+"""
+Rotation, quaternion and vector toolkit.
 
-from .Hrotx import Hrotx
-from .Hroty import Hroty
-from .Hrotz import Hrotz
+The functions are exported lazily: importing the package only reads this
+file, a submodule (and NumPy with it) is imported the first time one of its
+functions is accessed, so short-lived scripts only pay for what they use.
 
+Most functions live in a submodule of the same name, AdelmanPy.rotx is the
+function rotx like with the former eager imports, and
 
+    >>> from AdelmanPy.rotx import rotx
 
-from .rotx import rotx
-from .roty import roty
-from .rotz import rotz
\ No newline at end of file
+imports it from its submodule. Importing such a submodule directly binds
+the module under its name on the package, as for any package, so take the
+function from the module then.
+"""
+import importlib
+import types
+
+# exported name: submodule that defines it
+_EXPORTS = {
+    'rotx': 'rotx',
+    'roty': 'roty',
+    'rotz': 'rotz',
+    'Hrotx': 'Hrotx',
+    'Hroty': 'Hroty',
+    'Hrotz': 'Hrotz',
+    'qrotx': 'qrotx',
+    'qroty': 'qroty',
+    'qrotz': 'qrotz',
+    'rot': 'rot',
+    'rotq': 'rotq',
+    'quatmult': 'quatmult',
+    'quat2axisangle': 'quat2axisangle',
+    'vector_cross': 'vectorCross',
+    'vector_magnitude': 'vectorMagnitude',
+    'quat_multiply': 'quaternions',
+    'quat_conjugate': 'quaternions',
+    'quat_normalize': 'quaternions',
+    'quat_to_dcm': 'quaternions',
+    'dcm_to_quat': 'quaternions',
+    'quat_to_axisangle': 'quaternions',
+    'axisangle_to_quat': 'quaternions',
+    'quat_slerp': 'quaternions',
+    'set_backend': 'backend',
+    'get_backend': 'backend',
+}
+
+# submodules that are exported as modules
+_SUBMODULES = ('quaternions', 'backend')
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    # cache it, later accesses no longer reach __getattr__
+    globals()[name] = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+
+    # the submodules it imported are bound on the package by the import system,
+    # e.g. Hrotx imports rotx, put the functions of the same name back over them
+    for other, submodule in _EXPORTS.items():
+        if other == submodule and isinstance(globals().get(other), types.ModuleType):
+            globals()[other] = getattr(globals()[other], other)
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Backend selection of the AdelmanPy and robot_FK kernels.
+
+With the 'numba' backend the rotation primitives, the quaternion helpers
+and robot_FK.FK run loop kernels compiled by numba.njit, which removes the
+NumPy dispatch overhead that dominates single pose calls in the control
+loop. The 'numpy' backend runs the vectorized NumPy code and is the
+default: importing numba and loading the cached kernels adds about half a
+second to the first call, more than short-lived scripts ever save. Long
+running controllers select the numba backend with the environment variable
+ADELMANPY_BACKEND=numba or with
+
+    >>> import AdelmanPy
+    >>> AdelmanPy.set_backend('numba')
+
+and fall back to the 'numpy' backend with a warning when numba is not
+installed. The kernels are compiled on first use and cached on disk
+(cache=True), so only the first run of a kernel pays its compilation.
+
+Version: 1.0.0
+
+Required Python packages:
+    - numba (optional)
+
+Created: 2026-10-18
+Revised: 2026-10-18
+Version: 1.0.0
+
+Version Notes:
+    1.0.0 (2026-10-18): Initial version
+"""
+import importlib.util
+import os
+import warnings
+
+BACKENDS = ('numpy', 'numba')
+
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+
+# the active backend, read by every function that has a kernel
+name = 'numpy'
+
+# compiled kernel of every plain Python kernel function
+_compiled = {}
+
+
+def set_backend(backend: str) -> None:
+    """
+    Select the backend of the functions that have a compiled kernel.
+
+    Args:
+        backend (str): 'numba' or 'numpy', 'numba' falls back to 'numpy'
+            when numba is not installed.
+
+    Raises:
+        ValueError: For an unknown backend.
+    """
+
+    global name
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == 'numba' and not NUMBA_AVAILABLE:
+        warnings.warn("numba is not installed, using the numpy backend")
+        backend = 'numpy'
+    name = backend
+
+
+def get_backend() -> str:
+    """
+    Return the active backend, 'numba' or 'numpy'.
+    """
+
+    return name
+
+
+def compiled(kernel):
+    """
+    Return the numba compiled version of a plain Python kernel function.
+
+    The kernel is compiled the first time it is requested, numba is imported
+    then. Kernels are plain Python loops over float64 arrays, so they can be
+    read and debugged without numba.
+    """
+
+    try:
+        return _compiled[kernel]
+    except KeyError:
+        import numba
+        _compiled[kernel] = numba.njit(cache=True)(kernel)
+        return _compiled[kernel]
+
+
+if 'ADELMANPY_BACKEND' in os.environ:
+    set_backend(os.environ['ADELMANPY_BACKEND'])
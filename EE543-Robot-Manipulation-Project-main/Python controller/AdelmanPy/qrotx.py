@@ -8,11 +8,13 @@ def qrotx(angle: float) -> np.ndarray:
     'angle' radians around the x-axis.
 
     Args:
-        angle (float): The angle of rotation in radians.
+        angle (float or np.ndarray): The angle of rotation in radians, or
+            an array of angles of any shape.
 
     Returns:
         np.ndarray: A 4x1 numpy array representing the quaternion in
-                    scalar-first format [w, x, y, z].
+                    scalar-first format [w, x, y, z],
+                    or a (..., 4, 1) stack of them for an array of angles.
 
     Example:
         >>> import numpy as np
@@ -47,19 +49,21 @@ def qrotx(angle: float) -> np.ndarray:
     Author: Ian Adelman
     Email: IanAdelman@outlook.com
     Created: 2023-04-01
-    Revised: 2025-02-01
-    Version: 2.0.0
+    Revised: 2026-10-18
+    Version: 2.1.0
 
     Version Notes:
+        2.1.0 (2026-10-18): Vectorized, accepts arrays of angles of any
+                            shape and returns a (..., 4, 1) stack
         2.0.0 (2025-02-01): Converted from MATLAB to Python, updated function
                             header formatting
         1.5.0 (2023-03-18): updated header, increased readability
         1.0.0 (2022)
     """
     
-    q = np.array([[np.cos(angle/2)],
-                  [np.sin(angle/2)],
-                  [0],
-                  [0]])
-    
+    angle = np.asarray(angle, dtype=float)
+    q = np.zeros(angle.shape + (4, 1))
+    q[..., 0, 0] = np.cos(angle/2)
+    q[..., 1, 0] = np.sin(angle/2)
+
     return q
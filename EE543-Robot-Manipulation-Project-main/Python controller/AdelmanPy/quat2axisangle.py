@@ -1,5 +1,7 @@
 import numpy as np
 
+from .quaternions import quat_to_axisangle
+
 def quat2axisangle(q: np.ndarray) -> tuple[np.ndarray, float]:
     """
     Calculate the Euler rotation axis and angle from a unit quaternion.
@@ -9,34 +11,36 @@ def quat2axisangle(q: np.ndarray) -> tuple[np.ndarray, float]:
 
     Args:
         q (np.ndarray): A 4x1 unit quaternion in
-        scalar-first format [w, x, y, z].
+        scalar-first format [w, x, y, z], or a (..., 4, 1) stack of them.
 
     Returns:
         tuple[np.ndarray, float]: A tuple containing:
             - axis (np.ndarray): A 3x1 unit vector representing the axis of
-              rotation.
-            - angle (float): The angle of rotation in radians.
+              rotation, or a (..., 3, 1) stack of them.
+            - angle (float): The angle of rotation in radians, or an array
+              of them for a stack of quaternions.
 
     Example:
         >>> import numpy as np
         >>> np.set_printoptions(precision=4, suppress=True)
-        >>> quat = np.array([[1], [0.1], [0.2], [0.3]])
+        >>> quat = np.array([[0.9274], [0.1], [0.2], [0.3]])
         >>> axis, angle = quat2axisangle(quat)
         >>> print(f"Axis: {axis.T}")
-        >>> print(f"Angle: {angle}")
+        >>> print(f"Angle: {angle:.4f}")
         Axis: [[0.2673 0.5345 0.8018]]
-        Angle: 0.7497
+        Angle: 0.7670
 
     Description:
         When given an input of a 4x1 unit quaternion, this function calculates
         the equivalent Euler rotation about an axis. The axis is normalized,
-        and the angle is constrained to be within plus/minus 2 pi
+        and the angle is the shorter of the two equivalent rotations, within
+        0 and pi
 
     Required Python packages:
         - numpy
 
     Subfunctions:
-        None
+        - quaternions.quat_to_axisangle
 
     Required data files:
         None
@@ -44,6 +48,8 @@ def quat2axisangle(q: np.ndarray) -> tuple[np.ndarray, float]:
     Notes:
         - The function assumes the input quaternion is a unit quaternion.
         - The output axis is normalized to ensure it's a unit vector.
+        - For the identity rotation the axis is undetermined and [1, 0, 0]
+          is returned.
 
     See Also:
         - https://en.wikipedia.org/wiki/Quaternions_and_spatial_rotation
@@ -51,26 +57,26 @@ def quat2axisangle(q: np.ndarray) -> tuple[np.ndarray, float]:
     Author: Ian Adelman
     Email: IanAdelman@outlook.com
     Created: 2023
-    Revised: 2025-02-01
-    Version: 2.1.0
+    Revised: 2026-10-18
+    Version: 2.2.0
 
     Version Notes:
+        2.2.0 (2026-10-18): Converts with quaternions.quat_to_axisangle, the
+                            angle comes from atan2 instead of arccos and the
+                            axis no longer divides by sin(angle/2), which
+                            was unstable near zero and flipped the rotation
+                            of quaternions with w < 0; accepts stacks of
+                            quaternions
         2.1.0 (2025-02-01): Converted from MATLAB to Python, updated function
                             header formatting
         2.0.0 (2023-03-18): Updated function header, improved code readability,
                             normalized angle and vector, added warning
     """
     
-    # Calculate angle of rotation
-    angle = 2 * np.arccos(q[0, 0])
-
-    # Normalize angle to be within ±2π
-    angle = np.angle(np.exp(1j * angle))
-
-    # Calculate axis of rotation
-    axis = q[1:4] / np.sin(angle / 2)
+    # Calculate axis and angle of rotation of the (..., 4) quaternions
+    axis, angle = quat_to_axisangle(np.asarray(q, dtype=float)[..., 0])
 
-    # Normalize vector
-    axis = axis / np.linalg.norm(axis)
+    # Return the axis as column vectors
+    axis = axis[..., np.newaxis]
 
     return axis, angle
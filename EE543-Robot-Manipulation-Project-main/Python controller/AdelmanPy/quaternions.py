@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+Batched quaternion algebra.
+
+Every function works on quaternions stored along the last axis of an array,
+shape (..., 4) in scalar-first format [w, x, y, z], and broadcasts over the
+leading axes, so thousands of orientations are processed in one call. The
+single quaternion functions quatmult, rotq and quat2axisangle are thin
+wrappers around this module for 4x1 column vectors. With the numba
+backend quat_multiply, quat_to_dcm, dcm_to_quat and quat_slerp run the
+compiled loop kernels at the end of this module.
+
+Version: 1.1.0
+
+Required Python packages:
+    - numpy
+    - numba (optional)
+
+Notes:
+    - Quaternions follow the Hamilton convention, the same as rotq, so
+      quat_to_dcm(q) @ v rotates v by q.
+    - Divisions by sin of small angles are avoided: quat_to_axisangle
+      normalizes the vector part instead and quat_slerp switches to its
+      limit form below SMALL_ANGLE.
+
+See Also:
+    - https://en.wikipedia.org/wiki/Quaternions_and_spatial_rotation
+    - https://en.wikipedia.org/wiki/Slerp
+
+Created: 2026-10-18
+Revised: 2026-10-18
+Version: 1.1.0
+
+Version Notes:
+    1.1.0 (2026-10-18): Added the numba backend kernels
+    1.0.0 (2026-10-18): Initial version, batched replacements of quatmult,
+                        rotq and quat2axisangle plus the inverse conversions
+                        and slerp
+"""
+import math
+
+import numpy as np
+
+from . import backend
+
+# below this angle (radians) quat_slerp uses its small-angle limit form
+SMALL_ANGLE = 1e-6
+
+
+def quat_multiply(qA: np.ndarray, qB: np.ndarray) -> np.ndarray:
+    """
+    Hamilton product qA * qB, the rotation qB followed by qA.
+
+    Args:
+        qA (np.ndarray): (..., 4) quaternions.
+        qB (np.ndarray): (..., 4) quaternions, broadcast against qA.
+
+    Returns:
+        np.ndarray: (..., 4) product quaternions, not renormalized.
+
+    Example:
+        >>> qz = axisangle_to_quat([0, 0, 1], np.pi/2)
+        >>> quat_multiply(qz, qz)
+        array([0., 0., 0., 1.])
+    """
+
+    qA = np.asarray(qA, dtype=float)
+    qB = np.asarray(qB, dtype=float)
+    if backend.name == 'numba':
+        if qA.shape != qB.shape:
+            qA, qB = [np.ascontiguousarray(q) for q in np.broadcast_arrays(qA, qB)]
+        qAB = backend.compiled(_quat_multiply_kernel)(qA.reshape(-1, 4), qB.reshape(-1, 4))
+        return qAB.reshape(qA.shape)
+
+    wA, xA, yA, zA = np.moveaxis(qA, -1, 0)
+    wB, xB, yB, zB = np.moveaxis(qB, -1, 0)
+
+    qAB = np.empty(np.broadcast_shapes(qA.shape, qB.shape))
+    qAB[..., 0] = wA*wB - xA*xB - yA*yB - zA*zB
+    qAB[..., 1] = wA*xB + xA*wB + yA*zB - zA*yB
+    qAB[..., 2] = wA*yB - xA*zB + yA*wB + zA*xB
+    qAB[..., 3] = wA*zB + xA*yB - yA*xB + zA*wB
+    return qAB
+
+
+def quat_conjugate(q: np.ndarray) -> np.ndarray:
+    """
+    Conjugate [w, -x, -y, -z], the inverse rotation of a unit quaternion.
+
+    Args:
+        q (np.ndarray): (..., 4) quaternions.
+
+    Returns:
+        np.ndarray: (..., 4) conjugate quaternions.
+    """
+
+    q_conj = np.array(q, dtype=float)
+    q_conj[..., 1:] *= -1
+    return q_conj
+
+
+def quat_normalize(q: np.ndarray) -> np.ndarray:
+    """
+    Scale quaternions to unit length.
+
+    Args:
+        q (np.ndarray): (..., 4) non-zero quaternions.
+
+    Returns:
+        np.ndarray: (..., 4) unit quaternions.
+    """
+
+    q = np.asarray(q, dtype=float)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def quat_to_dcm(q: np.ndarray) -> np.ndarray:
+    """
+    Convert unit quaternions to direction cosine matrices.
+
+    Args:
+        q (np.ndarray): (..., 4) unit quaternions.
+
+    Returns:
+        np.ndarray: (..., 3, 3) direction cosine matrices.
+
+    Example:
+        >>> quat_to_dcm([1, 0, 0, 0])
+        array([[1., 0., 0.],
+               [0., 1., 0.],
+               [0., 0., 1.]])
+    """
+
+    q = np.asarray(q, dtype=float)
+    if backend.name == 'numba':
+        return backend.compiled(_quat_to_dcm_kernel)(q.reshape(-1, 4)).reshape(q.shape[:-1] + (3, 3))
+
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    DCM = np.empty(q.shape[:-1] + (3, 3))
+    DCM[..., 0, 0] = 1 - 2*(y*y + z*z)
+    DCM[..., 0, 1] = 2*(x*y - w*z)
+    DCM[..., 0, 2] = 2*(x*z + w*y)
+    DCM[..., 1, 0] = 2*(x*y + w*z)
+    DCM[..., 1, 1] = 1 - 2*(x*x + z*z)
+    DCM[..., 1, 2] = 2*(y*z - w*x)
+    DCM[..., 2, 0] = 2*(x*z - w*y)
+    DCM[..., 2, 1] = 2*(y*z + w*x)
+    DCM[..., 2, 2] = 1 - 2*(x*x + y*y)
+    return DCM
+
+
+def dcm_to_quat(DCM: np.ndarray) -> np.ndarray:
+    """
+    Convert direction cosine matrices to unit quaternions.
+
+    Args:
+        DCM (np.ndarray): (..., 3, 3) rotation matrices.
+
+    Returns:
+        np.ndarray: (..., 4) unit quaternions with w >= 0.
+
+    Description:
+        Shepperd's method: the four columns of K below are 4 w q, 4 x q,
+        4 y q and 4 z q. The column with the largest diagonal element is
+        the best conditioned one and is normalized into q, so no square
+        root of a value close to zero is taken for any rotation.
+    """
+
+    DCM = np.asarray(DCM, dtype=float)
+    if backend.name == 'numba':
+        return backend.compiled(_dcm_to_quat_kernel)(DCM.reshape(-1, 3, 3)).reshape(DCM.shape[:-2] + (4,))
+
+    R00, R01, R02 = DCM[..., 0, 0], DCM[..., 0, 1], DCM[..., 0, 2]
+    R10, R11, R12 = DCM[..., 1, 0], DCM[..., 1, 1], DCM[..., 1, 2]
+    R20, R21, R22 = DCM[..., 2, 0], DCM[..., 2, 1], DCM[..., 2, 2]
+
+    K = np.empty(DCM.shape[:-2] + (4, 4))
+    K[..., 0, 0] = 1 + R00 + R11 + R22
+    K[..., 1, 1] = 1 + R00 - R11 - R22
+    K[..., 2, 2] = 1 - R00 + R11 - R22
+    K[..., 3, 3] = 1 - R00 - R11 + R22
+    K[..., 0, 1] = K[..., 1, 0] = R21 - R12
+    K[..., 0, 2] = K[..., 2, 0] = R02 - R20
+    K[..., 0, 3] = K[..., 3, 0] = R10 - R01
+    K[..., 1, 2] = K[..., 2, 1] = R01 + R10
+    K[..., 1, 3] = K[..., 3, 1] = R02 + R20
+    K[..., 2, 3] = K[..., 3, 2] = R12 + R21
+
+    best = np.argmax(np.diagonal(K, axis1=-2, axis2=-1), axis=-1)
+    q = np.take_along_axis(K, best[..., np.newaxis, np.newaxis], axis=-1)[..., 0]
+    q = quat_normalize(q)
+
+    # q and -q are the same rotation, return the one with w >= 0
+    return np.where(q[..., :1] < 0, -q, q)
+
+
+def quat_to_axisangle(q: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert unit quaternions to rotation axes and angles.
+
+    Args:
+        q (np.ndarray): (..., 4) unit quaternions.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: A tuple containing:
+            - axis (np.ndarray): (..., 3) unit rotation axes.
+            - angle (np.ndarray): (...) rotation angles in [0, pi] radians.
+
+    Description:
+        The angle is 2 atan2(|v|, |w|) of the vector part v, which is
+        accurate for every angle unlike 2 arccos(w) near 0. The quaternion
+        is flipped to w >= 0 first, so the shorter of the two equivalent
+        rotations is returned. The axis is the normalized vector part,
+        which stays accurate for tiny angles; only for the identity
+        rotation, where it is undetermined, [1, 0, 0] is returned.
+    """
+
+    q = np.asarray(q, dtype=float)
+    sign = np.where(q[..., :1] < 0, -1.0, 1.0)
+    w = np.abs(q[..., 0])
+    v = sign * q[..., 1:]
+
+    sin_half = np.linalg.norm(v, axis=-1)
+    angle = 2 * np.arctan2(sin_half, w)
+
+    identity = sin_half < np.finfo(float).tiny
+    axis = np.where(identity[..., np.newaxis], [1.0, 0.0, 0.0],
+                    v / np.where(identity, 1.0, sin_half)[..., np.newaxis])
+    return axis, angle
+
+
+def axisangle_to_quat(axis: np.ndarray, angle: np.ndarray) -> np.ndarray:
+    """
+    Convert rotation axes and angles to unit quaternions.
+
+    Args:
+        axis (np.ndarray): (..., 3) rotation axes, normalized here.
+        angle (float or np.ndarray): Rotation angles in radians, broadcast
+            against the leading axes of axis.
+
+    Returns:
+        np.ndarray: (..., 4) unit quaternions.
+    """
+
+    axis = np.asarray(axis, dtype=float)
+    angle = np.asarray(angle, dtype=float)
+
+    # a zero axis is only meaningful with a zero angle, it gives the identity
+    norm = np.linalg.norm(axis, axis=-1, keepdims=True)
+    axis = axis / np.where(norm > 0, norm, 1.0)
+
+    half = angle[..., np.newaxis] / 2
+    shape = np.broadcast_shapes(axis.shape[:-1], angle.shape) + (4,)
+    q = np.empty(shape)
+    q[..., :1] = np.cos(half)
+    q[..., 1:] = np.sin(half) * axis
+    return q
+
+
+def quat_slerp(q0: np.ndarray, q1: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """
+    Spherical linear interpolation between unit quaternions.
+
+    Args:
+        q0 (np.ndarray): (..., 4) start quaternions.
+        q1 (np.ndarray): (..., 4) end quaternions.
+        t (float or np.ndarray): Interpolation fractions, 0 gives q0 and 1
+            gives q1, broadcast against the leading axes of q0 and q1.
+
+    Returns:
+        np.ndarray: (..., 4) unit quaternions rotating at constant angular
+            velocity along the shorter arc from q0 to q1.
+
+    Example:
+        >>> q1 = axisangle_to_quat([0, 0, 1], np.pi/2)
+        >>> q = quat_slerp([1, 0, 0, 0], q1, np.linspace(0, 1, 1000))
+        >>> q.shape
+        (1000, 4)
+
+    Description:
+        Below SMALL_ANGLE between the quaternions sin(theta) vanishes and
+        the weights sin((1 - t) theta) / sin(theta) and sin(t theta) /
+        sin(theta) reach their limits 1 - t and t, so normalized linear
+        interpolation is used there.
+    """
+
+    q0 = np.asarray(q0, dtype=float)
+    q1 = np.asarray(q1, dtype=float)
+    t = np.asarray(t, dtype=float)
+    if backend.name == 'numba':
+        if not q0.shape == q1.shape == t.shape + (4,):
+            q0, q1, t = [np.ascontiguousarray(a) for a in np.broadcast_arrays(q0, q1, t[..., np.newaxis])]
+            t = t[..., 0]
+        q = backend.compiled(_quat_slerp_kernel)(q0.reshape(-1, 4), q1.reshape(-1, 4), t.reshape(-1))
+        return q.reshape(q0.shape)
+
+    t = t[..., np.newaxis]
+
+    # q1 and -q1 are the same rotation, interpolate along the shorter arc
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+
+    # half the angle between the rotations, from atan2 to stay accurate near 0
+    theta = np.arctan2(np.linalg.norm(q1 - dot * q0, axis=-1, keepdims=True), dot)
+    small = theta < SMALL_ANGLE
+    sin_theta = np.where(small, 1.0, np.sin(theta))
+    w0 = np.where(small, 1 - t, np.sin((1 - t) * theta) / sin_theta)
+    w1 = np.where(small, t, np.sin(t * theta) / sin_theta)
+
+    return quat_normalize(w0 * q0 + w1 * q1)
+
+
+# Loop kernels of the numba backend, one quaternion (row) per iteration
+
+def _quat_multiply_kernel(qA, qB):
+    qAB = np.empty((qA.shape[0], 4))
+    for i in range(qA.shape[0]):
+        wA, xA, yA, zA = qA[i, 0], qA[i, 1], qA[i, 2], qA[i, 3]
+        wB, xB, yB, zB = qB[i, 0], qB[i, 1], qB[i, 2], qB[i, 3]
+        qAB[i, 0] = wA*wB - xA*xB - yA*yB - zA*zB
+        qAB[i, 1] = wA*xB + xA*wB + yA*zB - zA*yB
+        qAB[i, 2] = wA*yB - xA*zB + yA*wB + zA*xB
+        qAB[i, 3] = wA*zB + xA*yB - yA*xB + zA*wB
+    return qAB
+
+
+def _quat_to_dcm_kernel(q):
+    DCM = np.empty((q.shape[0], 3, 3))
+    for i in range(q.shape[0]):
+        w, x, y, z = q[i, 0], q[i, 1], q[i, 2], q[i, 3]
+        DCM[i, 0, 0] = 1 - 2*(y*y + z*z)
+        DCM[i, 0, 1] = 2*(x*y - w*z)
+        DCM[i, 0, 2] = 2*(x*z + w*y)
+        DCM[i, 1, 0] = 2*(x*y + w*z)
+        DCM[i, 1, 1] = 1 - 2*(x*x + z*z)
+        DCM[i, 1, 2] = 2*(y*z - w*x)
+        DCM[i, 2, 0] = 2*(x*z - w*y)
+        DCM[i, 2, 1] = 2*(y*z + w*x)
+        DCM[i, 2, 2] = 1 - 2*(x*x + y*y)
+    return DCM
+
+
+def _dcm_to_quat_kernel(DCM):
+    # Shepperd's method, the same case selection as dcm_to_quat
+    q = np.empty((DCM.shape[0], 4))
+    for i in range(DCM.shape[0]):
+        R = DCM[i]
+        trace = R[0, 0] + R[1, 1] + R[2, 2]
+        if trace >= R[0, 0] and trace >= R[1, 1] and trace >= R[2, 2]:
+            w, x, y, z = 1 + trace, R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]
+        elif R[0, 0] >= R[1, 1] and R[0, 0] >= R[2, 2]:
+            w, x, y, z = R[2, 1] - R[1, 2], 1 + R[0, 0] - R[1, 1] - R[2, 2], R[0, 1] + R[1, 0], R[0, 2] + R[2, 0]
+        elif R[1, 1] >= R[2, 2]:
+            w, x, y, z = R[0, 2] - R[2, 0], R[0, 1] + R[1, 0], 1 - R[0, 0] + R[1, 1] - R[2, 2], R[1, 2] + R[2, 1]
+        else:
+            w, x, y, z = R[1, 0] - R[0, 1], R[0, 2] + R[2, 0], R[1, 2] + R[2, 1], 1 - R[0, 0] - R[1, 1] + R[2, 2]
+        norm = math.sqrt(w*w + x*x + y*y + z*z)
+        if w < 0:
+            norm = -norm
+        q[i, 0], q[i, 1], q[i, 2], q[i, 3] = w / norm, x / norm, y / norm, z / norm
+    return q
+
+
+def _quat_slerp_kernel(q0, q1, t):
+    q = np.empty((t.shape[0], 4))
+    for i in range(t.shape[0]):
+        dot = q0[i, 0]*q1[i, 0] + q0[i, 1]*q1[i, 1] + q0[i, 2]*q1[i, 2] + q0[i, 3]*q1[i, 3]
+        sign = 1.0
+        if dot < 0:
+            sign, dot = -1.0, -dot
+        ortho = 0.0
+        for j in range(4):
+            ortho += (sign*q1[i, j] - dot*q0[i, j])**2
+        theta = math.atan2(math.sqrt(ortho), dot)
+        if theta < SMALL_ANGLE:
+            w0, w1 = 1 - t[i], t[i]
+        else:
+            w0 = math.sin((1 - t[i]) * theta) / math.sin(theta)
+            w1 = math.sin(t[i] * theta) / math.sin(theta)
+        norm = 0.0
+        for j in range(4):
+            q[i, j] = w0*q0[i, j] + w1*sign*q1[i, j]
+            norm += q[i, j]**2
+        norm = math.sqrt(norm)
+        for j in range(4):
+            q[i, j] /= norm
+    return q
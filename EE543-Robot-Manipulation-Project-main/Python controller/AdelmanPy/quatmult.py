@@ -1,6 +1,8 @@
 import numpy as np
 import warnings
 
+from .quaternions import quat_multiply
+
 def quatmult(qA: np.ndarray, qB: np.ndarray) -> np.ndarray:
     """
     Multiply two unit quaternions to create a combined rotation quaternion.
@@ -9,11 +11,14 @@ def quatmult(qA: np.ndarray, qB: np.ndarray) -> np.ndarray:
     the composition of their rotations in 3D space.
 
     Args:
-        qA (np.ndarray): 4x1 unit quaternion (scalar-first format)
-        qB (np.ndarray): 4x1 unit quaternion (scalar-first format)
+        qA (np.ndarray): 4x1 unit quaternion (scalar-first format), or a
+            (..., 4, 1) stack of them
+        qB (np.ndarray): 4x1 unit quaternion (scalar-first format), or a
+            (..., 4, 1) stack of them
 
     Returns:
-        np.ndarray: 4x1 combined unit quaternion (scalar-first format)
+        np.ndarray: 4x1 combined unit quaternion (scalar-first format), or
+            a (..., 4, 1) stack of them
 
     Example:
         >>> import numpy as np
@@ -27,8 +32,8 @@ def quatmult(qA: np.ndarray, qB: np.ndarray) -> np.ndarray:
          [...]]
 
     Description:
-        Implements the Hamilton product for quaternion multiplication using
-        matrix representation. Input quaternions must be in scalar-first
+        Implements the Hamilton product for quaternion multiplication with
+        quaternions.quat_multiply. Input quaternions must be in scalar-first
         format (w, x, y, z).
 
     Required Python packages:
@@ -36,7 +41,7 @@ def quatmult(qA: np.ndarray, qB: np.ndarray) -> np.ndarray:
         - warnings
 
     Subfunctions:
-        None
+        - quaternions.quat_multiply
 
     Required data files:
         None
@@ -52,33 +57,28 @@ def quatmult(qA: np.ndarray, qB: np.ndarray) -> np.ndarray:
     Author: Ian Adelman
     Email: IanAdelman@outlook.com
     Created: 2022
-    Revised: 2025-02-01
-    Version: 2.0.0
+    Revised: 2026-10-18
+    Version: 2.1.0
 
     Version Notes:
+        2.1.0 (2026-10-18): Computes the Hamilton product elementwise with
+                            quaternions.quat_multiply instead of building a
+                            4x4 matrix, accepts stacks of quaternions
         2.0.0 (2025-02-01): Converted from MATLAB to Python, added
                             normalization and warning
         1.0.0 (2023-03-18): Initial MATLAB version
     """
     
-    # Construct quaternion multiplication matrix
-    Q = np.array([
-        [qA[0,0], -qA[1,0], -qA[2,0], -qA[3,0]],
-        [qA[1,0],  qA[0,0], -qA[3,0],  qA[2,0]],
-        [qA[2,0],  qA[3,0],  qA[0,0], -qA[1,0]],
-        [qA[3,0], -qA[2,0],  qA[1,0],  qA[0,0]]
-    ])
-    
-    # Perform matrix multiplication
-    qAB = Q @ qB
-    
+    # Multiply the column vectors as (..., 4) quaternions
+    qAB = quat_multiply(qA[..., 0], qB[..., 0])[..., np.newaxis]
+
     # Normalize output quaternion (handles numerical drift)
-    if not np.isclose(np.linalg.norm(qAB), 1.0, atol=1e-6):
+    norm = np.linalg.norm(qAB, axis=-2, keepdims=True)
+    if not np.all(np.isclose(norm, 1.0, atol=1e-6)):
         warnings.warn(
             "Significant normalization required - check input quaternions")
 
-    
     # Normalize output quaternion
-    qAB /= np.linalg.norm(qAB)
+    qAB /= norm
     
     return qAB
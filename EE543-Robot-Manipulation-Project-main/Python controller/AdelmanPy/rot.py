@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
+import math
+
 import numpy as np
 
+from . import backend
+
 
 def rot(axis: np.ndarray, angle: float) -> np.ndarray:
     """
@@ -10,15 +14,17 @@ def rot(axis: np.ndarray, angle: float) -> np.ndarray:
     This function computes the 3x3 rotation matrix corresponding to a rotation
     of 'angle' radians around the specified 'axis'.
 
-    Version: 2.1.0
+    Version: 2.3.0
 
     Args:
-        axis (np.ndarray): A 3x1 unit position vector representing the axis
-        of rotation. angle (float): The angle of rotation in radians.
+        axis (np.ndarray): A 3x1 (or 3 element) position vector representing
+            the axis of rotation, or a (..., 3, 1) / (..., 3) stack of axes.
+        angle (float or np.ndarray): The angle of rotation in radians, or an
+            array of angles that broadcasts against the stack of axes.
 
     Returns:
         np.ndarray: A 3x3 numpy array representing the Direction Cosine
-                    Matrix (DCM).
+                    Matrix (DCM), or a (..., 3, 3) stack of them.
 
     Example:
         >>> import numpy as np
@@ -38,9 +44,10 @@ def rot(axis: np.ndarray, angle: float) -> np.ndarray:
 
     Required Python packages:
         - numpy
+        - numba (optional)
 
     Subfunctions:
-        None
+        - _rot_kernel (numba backend)
 
     Required data files:
         None
@@ -55,27 +62,67 @@ def rot(axis: np.ndarray, angle: float) -> np.ndarray:
     Author: Ian Adelman
     Email: IanAdelman@outlook.com
     Created: 2022
-    Revised: 2025-01-11
-    Version: 2.1.0
+    Revised: 2026-10-18
+    Version: 2.3.0
 
     Version Notes:
+        2.3.0 (2026-10-18): Runs a numba compiled kernel with the numba
+                            backend
+        2.2.0 (2026-10-18): Vectorized with the Rodrigues formula, accepts
+                            stacks of axes and arrays of angles and 3 element
+                            axes
         2.1.0 (2025-01-11): Converted from MATLAB to Python, updated function
                             header formatting with help from perplexity
         2.0.0 (2023-03-18): updated function header, improved code readability
     """
 
+    # accept 3x1 column vectors as well as 3 element vectors
+    axis = np.asarray(axis, dtype=float)
+    if axis.shape[-1] == 1:
+        axis = axis[..., 0]
+
+    if backend.name == 'numba':
+        angle = np.asarray(angle, dtype=float)
+        if axis.shape[:-1] != angle.shape:
+            axis, angle = [np.ascontiguousarray(a) for a in np.broadcast_arrays(axis, angle[..., np.newaxis])]
+            angle = angle[..., 0]
+        DCM = backend.compiled(_rot_kernel)(axis.reshape(-1, 3), angle.reshape(-1))
+        return DCM.reshape(angle.shape + (3, 3))
+
     # normalize vector before rotating about it
-    axis = axis / np.linalg.norm(axis)
+    axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
 
-    # define versin(angle)
-    versin = 1-np.cos(angle)
+    # define versin(angle), shaped to broadcast against stacks of 3x3 matrices
+    angle = np.asarray(angle, dtype=float)[..., np.newaxis, np.newaxis]
+    cos_angle, sin_angle = np.cos(angle), np.sin(angle)
+    versin = 1-cos_angle
 
+    # compute axis-angle rotation matrix, cos(angle) I + sin(angle) [axis]x + versin axis axis^T
+    cross = np.zeros(axis.shape + (3,))
+    cross[..., 0, 1], cross[..., 0, 2] = -axis[..., 2], axis[..., 1]
+    cross[..., 1, 0], cross[..., 1, 2] = axis[..., 2], -axis[..., 0]
+    cross[..., 2, 0], cross[..., 2, 1] = -axis[..., 1], axis[..., 0]
 
-    # compute axis-angle rotation matrix
-    row1 = np.array([axis[0,0]**2 * versin + np.cos(angle), axis[0,0]*axis[1,0] * versin - axis[2,0]*np.sin(angle), axis[0,0]*axis[2,0]*versin + axis[1,0]*np.sin(angle)])
-    row2 = np.array([axis[0,0]*axis[1,0]*versin + axis[2,0]*np.sin(angle), (axis[1,0])**2*versin + np.cos(angle), axis[1,0]*axis[2,0]*versin - axis[0,0]*np.sin(angle) ])
-    row3 = np.array([axis[2,0]*axis[0,0]*versin - axis[1,0]*np.sin(angle), axis[1,0]*axis[2,0]*versin + axis[0,0]*np.sin(angle), axis[2,0]**2 * versin + np.cos(angle)])
-    
-    DCM = np.vstack((row1,row2,row3))
+    DCM = versin * (axis[..., :, np.newaxis] * axis[..., np.newaxis, :]) + sin_angle * cross + cos_angle * np.eye(3)
     
     return DCM
+
+
+def _rot_kernel(axis, angle):
+    # the Rodrigues DCM of every row of axis and angle, compiled by the numba backend
+    DCM = np.empty((angle.shape[0], 3, 3))
+    for i in range(angle.shape[0]):
+        norm = math.sqrt(axis[i, 0]**2 + axis[i, 1]**2 + axis[i, 2]**2)
+        x, y, z = axis[i, 0] / norm, axis[i, 1] / norm, axis[i, 2] / norm
+        c, s = math.cos(angle[i]), math.sin(angle[i])
+        v = 1 - c
+        DCM[i, 0, 0] = v*x*x + c
+        DCM[i, 0, 1] = v*x*y - s*z
+        DCM[i, 0, 2] = v*x*z + s*y
+        DCM[i, 1, 0] = v*x*y + s*z
+        DCM[i, 1, 1] = v*y*y + c
+        DCM[i, 1, 2] = v*y*z - s*x
+        DCM[i, 2, 0] = v*x*z - s*y
+        DCM[i, 2, 1] = v*y*z + s*x
+        DCM[i, 2, 2] = v*z*z + c
+    return DCM
@@ -1,5 +1,7 @@
 import numpy as np
 
+from .quaternions import quat_to_dcm
+
 def rotq(q: np.ndarray) -> np.ndarray:
     """
     Convert a quaternion to a direction cosine matrix (DCM).
@@ -9,10 +11,12 @@ def rotq(q: np.ndarray) -> np.ndarray:
 
     Args:
         q (np.ndarray): A 4x1 quaternion in scalar-first format
-                        [q0, q1, q2, q3].
+                        [q0, q1, q2, q3], or a (..., 4, 1) or (..., 4)
+                        stack of them.
 
     Returns:
-        np.ndarray: A 3x3 numpy array representing the Direction Cosine Matrix
+        np.ndarray: A 3x3 numpy array representing the Direction Cosine Matrix,
+            or a (..., 3, 3) stack of them
 
     Example:
         >>> import numpy as np
@@ -33,7 +37,7 @@ def rotq(q: np.ndarray) -> np.ndarray:
         - numpy
 
     Subfunctions:
-        None
+        - quaternions.quat_to_dcm
 
     Required data files:
         None
@@ -49,21 +53,22 @@ def rotq(q: np.ndarray) -> np.ndarray:
     Author: Ian Adelman
     Email: IanAdelman@outlook.com
     Created: 2023
-    Revised: 2025-02-01
-    Version: 2.1.0
+    Revised: 2026-10-18
+    Version: 2.2.0
 
     Version Notes:
+        2.2.0 (2026-10-18): Converts with quaternions.quat_to_dcm, accepts
+                            stacks of quaternions
         2.1.0 (2025-02-01): Converted from MATLAB to Python, updated function
                             header formatting
         2.0.0 (2023-02-11): Original MATLAB version
     """
     
-    q0, q1, q2, q3 = q.flatten()
-    
-    dcm = np.array([
-        [2*q0**2 - 1 + 2*q1**2, 2*q1*q2 - 2*q0*q3, 2*q1*q3 + 2*q0*q2],
-        [2*q1*q2 + 2*q0*q3, 2*q0**2 - 1 + 2*q2**2, 2*q2*q3 - 2*q0*q1],
-        [2*q1*q3 - 2*q0*q2, 2*q2*q3 + 2*q0*q1, 2*q0**2 - 1 + 2*q3**2]
-    ])
+    # accept 4x1 column vectors as well as 4 element vectors
+    q = np.asarray(q, dtype=float)
+    if q.shape[-1] == 1:
+        q = q[..., 0]
+
+    dcm = quat_to_dcm(q)
     
     return dcm
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
+import math
+
 import numpy as np
 
+from . import backend
+
 def rotx(phi: float) -> np.ndarray:
     """
     Compute the Direction Cosine Matrix (DCM) for rotation around the X-axis.
@@ -8,13 +12,15 @@ def rotx(phi: float) -> np.ndarray:
     This function calculates the 3x3 rotation matrix corresponding to
     a rotation of 'phi' radians around the X-axis.
 
-    Version: 2.1.0
+    Version: 2.3.0
 
     Args:
-        phi (float): The rotation angle in radians.
+        phi (float or np.ndarray): The rotation angle in radians, or an
+            array of angles of any shape.
 
     Returns:
-        np.ndarray: A 3x3 numpy array representing the rotation matrix (DCM).
+        np.ndarray: A 3x3 numpy array representing the rotation matrix (DCM),
+            or a (..., 3, 3) stack of them for an array of angles.
 
     Example:
         >>> import numpy as np
@@ -28,9 +34,10 @@ def rotx(phi: float) -> np.ndarray:
 
     Required Python packages:
         - numpy
+        - numba (optional)
 
     Subfunctions:
-        None
+        - _rotx_kernel (numba backend)
 
     Required data files:
         None
@@ -46,17 +53,43 @@ def rotx(phi: float) -> np.ndarray:
     Author: Ian Adelman
     Email: IanAdelman@outlook.com
     Created: 2023
-    Revised: 2025-01-11
-    Version: 2.1.0
+    Revised: 2026-10-18
+    Version: 2.3.0
 
     Version Notes:
+        2.3.0 (2026-10-18): Runs a numba compiled kernel with the numba
+                            backend
+        2.2.0 (2026-10-18): Vectorized, accepts arrays of angles of any
+                            shape and returns a (..., 3, 3) stack
         2.1.0 (2025-01-11): Converted from MATLAB to Python, updated function
                             header formatting with help from perplexity 
         2.0.0 (2023-03-18): updated function header, improved code readability
     """
-    
-    return np.array([
-        [1, 0, 0],
-        [0, np.cos(phi), -np.sin(phi)],
-        [0, np.sin(phi), np.cos(phi)]
-    ])
+    phi = np.asarray(phi, dtype=float)
+    if backend.name == 'numba':
+        return backend.compiled(_rotx_kernel)(phi.reshape(-1)).reshape(phi.shape + (3, 3))
+
+    c, s = np.cos(phi), np.sin(phi)
+
+    # fill every matrix of the stack at once, the scalar case is a 0-d stack
+    DCM = np.zeros(phi.shape + (3, 3))
+    DCM[..., 0, 0] = 1
+    DCM[..., 1, 1] = c
+    DCM[..., 1, 2] = -s
+    DCM[..., 2, 1] = s
+    DCM[..., 2, 2] = c
+
+    return DCM
+
+
+def _rotx_kernel(phi):
+    # the DCM of every angle of a flat array, compiled by the numba backend
+    DCM = np.zeros((phi.shape[0], 3, 3))
+    for i in range(phi.shape[0]):
+        c, s = math.cos(phi[i]), math.sin(phi[i])
+        DCM[i, 0, 0] = 1.0
+        DCM[i, 1, 1] = c
+        DCM[i, 1, 2] = -s
+        DCM[i, 2, 1] = s
+        DCM[i, 2, 2] = c
+    return DCM
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
+import math
+
 import numpy as np
 
+from . import backend
+
 def rotz(psi: float) -> np.ndarray:
     """
     Compute the Direction Cosine Matrix (DCM) for rotation around the Z-axis.
@@ -8,13 +12,15 @@ def rotz(psi: float) -> np.ndarray:
     This function calculates the 3x3 rotation matrix corresponding to
     a rotation of 'psi' radians around the Z-axis.
 
-    Version: 2.1.0
+    Version: 2.3.0
 
     Args:
-        psi (float): The rotation angle in radians.
+        psi (float or np.ndarray): The rotation angle in radians, or an
+            array of angles of any shape.
 
     Returns:
-        np.ndarray: A 3x3 numpy array representing the rotation matrix (DCM).
+        np.ndarray: A 3x3 numpy array representing the rotation matrix (DCM),
+            or a (..., 3, 3) stack of them for an array of angles.
 
     Example:
         >>> import numpy as np
@@ -28,9 +34,10 @@ def rotz(psi: float) -> np.ndarray:
 
     Required Python packages:
         - numpy
+        - numba (optional)
 
     Subfunctions:
-        None
+        - _rotz_kernel (numba backend)
 
     Required data files:
         None
@@ -46,17 +53,43 @@ def rotz(psi: float) -> np.ndarray:
     Author: Ian Adelman
     Email: IanAdelman@outlook.com
     Created: 2023
-    Revised: 2025-01-11
-    Version: 2.1.0
+    Revised: 2026-10-18
+    Version: 2.3.0
 
     Version Notes:
+        2.3.0 (2026-10-18): Runs a numba compiled kernel with the numba
+                            backend
+        2.2.0 (2026-10-18): Vectorized, accepts arrays of angles of any
+                            shape and returns a (..., 3, 3) stack
         2.1.0 (2025-01-11): Converted from MATLAB to Python, updated function
                             header formatting with help from perplexity
         2.0.0 (2023-03-18): updated function header, improved code readability
     """
-    
-    return np.array([
-        [np.cos(psi), -np.sin(psi), 0],
-        [np.sin(psi), np.cos(psi), 0],
-        [0, 0, 1]
-    ])
+    psi = np.asarray(psi, dtype=float)
+    if backend.name == 'numba':
+        return backend.compiled(_rotz_kernel)(psi.reshape(-1)).reshape(psi.shape + (3, 3))
+
+    c, s = np.cos(psi), np.sin(psi)
+
+    # fill every matrix of the stack at once, the scalar case is a 0-d stack
+    DCM = np.zeros(psi.shape + (3, 3))
+    DCM[..., 0, 0] = c
+    DCM[..., 0, 1] = -s
+    DCM[..., 1, 0] = s
+    DCM[..., 1, 1] = c
+    DCM[..., 2, 2] = 1
+
+    return DCM
+
+
+def _rotz_kernel(psi):
+    # the DCM of every angle of a flat array, compiled by the numba backend
+    DCM = np.zeros((psi.shape[0], 3, 3))
+    for i in range(psi.shape[0]):
+        c, s = math.cos(psi[i]), math.sin(psi[i])
+        DCM[i, 0, 0] = c
+        DCM[i, 0, 1] = -s
+        DCM[i, 1, 0] = s
+        DCM[i, 1, 1] = c
+        DCM[i, 2, 2] = 1.0
+    return DCM
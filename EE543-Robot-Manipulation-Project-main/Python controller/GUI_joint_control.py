@@ -1,4 +1,5 @@
 import tkinter as tk
+import time
 import numpy as np
 import sys, os
 from robot_controller import robot_controller
@@ -8,70 +9,112 @@ RC = robot_controller()
 RC.communication_begin()
 RC.joints_homing()  # Force homing of the robot
 
+# The sender thread of the streaming mode owns the serial port from here on,
+# the callbacks below only queue commands, so the Tk main thread never blocks
+RC.stream_begin()
+
 # Control parameters
-increment = 5               # Increment angle (in degrees)
-goals = np.zeros(RC.joint_num)
+increment = 5               # Increment angle of a button click (in degrees)
+goals = RC.robot_homing_joint_poses.copy()
 speeds = np.ones(RC.joint_num) * 80   # Speed in degrees per second
 
-def update_joints():
+# Jogging: a press starts a move of one increment right away, a button held longer
+# than click_time jogs, its goal is kept a short lead ahead of the joint, so the
+# streamed move never runs out and stops as soon as the button is released
+jog_period_ms = 50          # how often a held button retargets the move
+jog_lead = 0.15             # how far (in seconds of motion) the goal leads the joint
+click_time = 0.3            # a press shorter than this (in seconds) is a click
+readout_period_ms = 50      # refresh period of the robot state readout
+
+jog = None                  # (joint, direction, press time, joint angle at the press) of the held button
+jog_after_id = None
+
+
+def stream(command, *args):
+    # once the sender thread stopped on an error every command raises it again,
+    # the readout shows it, so stop jogging instead of failing every callback
+    try:
+        command(*args)
+    except Exception as error:
+        if error is not RC.get_state()['error']:
+            raise
+        jog_stop_timer()
+
+def send_goals():
     global goals
     # Ensure joint targets remain within limits
     goals = np.clip(goals, RC.servo_angle_min, RC.servo_angle_max)
-    RC.joints_goto(goals, speeds)
-
-def joint1_plus():
-    global goals
-    goals[0] += increment
-    update_joints()
-
-def joint1_minus():
-    global goals
-    goals[0] -= increment
-    update_joints()
-
-def joint2_plus():
-    global goals
-    goals[1] += increment
-    update_joints()
-
-def joint2_minus():
-    global goals
-    goals[1] -= increment
-    update_joints()
-
-def joint3_plus():
-    global goals
-    goals[2] += increment
-    update_joints()
-
-def joint3_minus():
-    global goals
-    goals[2] -= increment
-    update_joints()
-
-def joint4_plus():
-    global goals
-    goals[3] += increment
-    update_joints()
-
-def joint4_minus():
-    global goals
-    goals[3] -= increment
-    update_joints()
+    # Retarget the current move from where the robot is, preempting never waits for the queue
+    stream(RC.stream_goto, goals, speeds)
+
+def jog_start(joint, direction):
+    global jog
+    jog_stop_timer()
+    jog = (joint, direction, time.perf_counter(), RC.get_state()['joint_poses'][joint])
+    jog_tick()
+
+def jog_tick():
+    global jog_after_id
+    joint, direction, pressed, start_angle = jog
+    if time.perf_counter() - pressed < click_time:
+        goals[joint] = start_angle + direction * increment
+    else:
+        goals[joint] = RC.get_state()['joint_poses'][joint] + direction * speeds[joint] * jog_lead
+    send_goals()
+    jog_after_id = root.after(jog_period_ms, jog_tick)
+
+def jog_stop(event=None):
+    global jog
+    if jog is None:
+        return
+    jog_stop_timer()
+    joint, direction, pressed, start_angle = jog
+    jog = None
+
+    # a click keeps moving to its increment, a jog stops where the joint is now
+    if time.perf_counter() - pressed >= click_time:
+        goals[joint] = RC.get_state()['joint_poses'][joint]
+        send_goals()
+
+def jog_stop_timer():
+    global jog_after_id
+    if jog_after_id is not None:
+        root.after_cancel(jog_after_id)
+        jog_after_id = None
 
 def home_robot():
     global goals
     # Reset joints to the robot's home pose.
     goals = RC.robot_homing_joint_poses.copy()
-    update_joints()
+    send_goals()
 
+# the gripper commands never wait for the queue either, see stream_gripper_set_percentage
 def grasper_open():
-    RC.gripper_open()
+    stream(RC.stream_gripper_set_percentage, 0)
 
 def grasper_close():
-    RC.gripper_close()
+    stream(RC.stream_gripper_set_percentage, 100)
+
+def update_readout():
+    # Poll the state the sender thread keeps updating, the pose is the robot_FK model of the controller
+    state = RC.get_state()
+    for label, angle in zip(lbl_joint_angles, state['joint_poses']):
+        label.config(text=f"{angle:7.1f} deg")
+    lbl_gripper_angle.config(text=f"{state['gripper_angle']:7.1f} deg")
+    x, y, z = state['endeffector_pose']
+    roll, pitch, yaw = state['endeffector_orientation']
+    lbl_position.config(text=f"x {x:8.1f}   y {y:8.1f}   z {z:8.1f}")
+    lbl_orientation.config(text=f"roll {roll:7.1f}   pitch {pitch:7.1f}   yaw {yaw:7.1f} deg")
+    if state['error'] is not None:
+        lbl_status.config(text=f"Stopped: {state['error']!r}", fg="red")
+    else:
+        lbl_status.config(text="Moving" if state['moving'] else "Idle",
+                          fg="dark orange" if state['moving'] else "dark green")
+    root.after(readout_period_ms, update_readout)
 
 def exit_app():
+    jog_stop_timer()
+    stream(RC.stream_end)
     root.destroy()
     RC.communication_end()
     sys.exit('Closing GUI controller')
@@ -79,6 +122,9 @@ def exit_app():
 # Create the main GUI window
 root = tk.Tk()
 root.title("EE543 Arm Controller")
+root.protocol("WM_DELETE_WINDOW", exit_app)
+# a button released while the window is not focused never sends its release event
+root.bind("<FocusOut>", jog_stop)
 
 # Create a frame for organizing the buttons
 frame = tk.Frame(root)
@@ -88,33 +134,19 @@ frame.pack(padx=10, pady=10)
 lbl_joints = tk.Label(frame, text="Joint Control", font=("Helvetica", 14))
 lbl_joints.grid(row=0, column=0, columnspan=4, pady=(0, 10))
 
-# Joint 1 Controls
-btn_joint1_plus = tk.Button(frame, text="Joint 1 +", command=joint1_plus, width=12)
-btn_joint1_plus.grid(row=1, column=0, padx=5, pady=5)
-
-btn_joint1_minus = tk.Button(frame, text="Joint 1 -", command=joint1_minus, width=12)
-btn_joint1_minus.grid(row=1, column=1, padx=5, pady=5)
-
-# Joint 2 Controls
-btn_joint2_plus = tk.Button(frame, text="Joint 2 +", command=joint2_plus, width=12)
-btn_joint2_plus.grid(row=2, column=0, padx=5, pady=5)
-
-btn_joint2_minus = tk.Button(frame, text="Joint 2 -", command=joint2_minus, width=12)
-btn_joint2_minus.grid(row=2, column=1, padx=5, pady=5)
-
-# Joint 3 Controls
-btn_joint3_plus = tk.Button(frame, text="Joint 3 +", command=joint3_plus, width=12)
-btn_joint3_plus.grid(row=3, column=0, padx=5, pady=5)
+# Joint Controls, click for one increment or hold to jog
+# the buttons act on press and release instead of a command, which only fires on release
+lbl_joint_angles = []
+for joint in range(RC.joint_num):
+    for column, (text, direction) in enumerate(((f"Joint {joint + 1} +", 1), (f"Joint {joint + 1} -", -1))):
+        btn_joint = tk.Button(frame, text=text, width=12)
+        btn_joint.grid(row=joint + 1, column=column, padx=5, pady=5)
+        btn_joint.bind("<ButtonPress-1>", lambda event, joint=joint, direction=direction: jog_start(joint, direction))
+        btn_joint.bind("<ButtonRelease-1>", jog_stop)
 
-btn_joint3_minus = tk.Button(frame, text="Joint 3 -", command=joint3_minus, width=12)
-btn_joint3_minus.grid(row=3, column=1, padx=5, pady=5)
-
-# Joint 4 Controls
-btn_joint4_plus = tk.Button(frame, text="Joint 4 +", command=joint4_plus, width=12)
-btn_joint4_plus.grid(row=4, column=0, padx=5, pady=5)
-
-btn_joint4_minus = tk.Button(frame, text="Joint 4 -", command=joint4_minus, width=12)
-btn_joint4_minus.grid(row=4, column=1, padx=5, pady=5)
+    lbl_joint_angle = tk.Label(frame, width=12, anchor="e", font=("Courier", 11))
+    lbl_joint_angle.grid(row=joint + 1, column=2, padx=5, pady=5)
+    lbl_joint_angles.append(lbl_joint_angle)
 
 # Label for extra controls
 lbl_extra = tk.Label(frame, text="Other Controls", font=("Helvetica", 14))
@@ -133,5 +165,27 @@ btn_grasp_close.grid(row=6, column=2, padx=5, pady=5)
 btn_exit = tk.Button(frame, text="Exit", command=exit_app, width=12, bg="red", fg="white")
 btn_exit.grid(row=6, column=3, padx=5, pady=5)
 
-# Start the Tkinter event loop
+# Robot state readout
+lbl_state = tk.Label(frame, text="Robot State", font=("Helvetica", 14))
+lbl_state.grid(row=7, column=0, columnspan=4, pady=(10, 10))
+
+tk.Label(frame, text="Gripper").grid(row=8, column=0, padx=5, pady=5)
+lbl_gripper_angle = tk.Label(frame, width=12, anchor="e", font=("Courier", 11))
+lbl_gripper_angle.grid(row=8, column=2, padx=5, pady=5)
+
+tk.Label(frame, text="Position").grid(row=9, column=0, padx=5, pady=5)
+lbl_position = tk.Label(frame, anchor="w", font=("Courier", 11))
+lbl_position.grid(row=9, column=1, columnspan=3, sticky="w", padx=5, pady=5)
+
+tk.Label(frame, text="Orientation").grid(row=10, column=0, padx=5, pady=5)
+lbl_orientation = tk.Label(frame, anchor="w", font=("Courier", 11))
+lbl_orientation.grid(row=10, column=1, columnspan=3, sticky="w", padx=5, pady=5)
+
+# Moving or idle, or the error that stopped the sender thread
+tk.Label(frame, text="Status").grid(row=11, column=0, padx=5, pady=5)
+lbl_status = tk.Label(frame, anchor="w", font=("Helvetica", 11, "bold"), wraplength=400, justify="left")
+lbl_status.grid(row=11, column=1, columnspan=3, sticky="w", padx=5, pady=5)
+
+# Start polling the robot state and the Tkinter event loop
+update_readout()
 root.mainloop()
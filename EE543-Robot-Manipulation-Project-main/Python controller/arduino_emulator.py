@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Software-in-the-loop emulator of the joint_controller.ino firmware.
+
+ArduinoEmulator runs the firmware state machine (IDLE, INIT, READY, STREAM,
+TIMEOUT) with the 'I'/'S'/'A' handshake, the 10 byte setpoints of protocol 1
+and the buffered, framed setpoints of protocol 2 (see serial_protocol.py).
+Instead of driving the PCA9685 it records every servo update in history.
+
+The emulator is reached through
+    EmulatedSerial: an in-process serial.Serial stand-in, pass it to
+                    robot_controller.communication_begin(ser=...)
+    PtyEmulator:    a pseudo terminal, open its port in place of 'COM3'
+                    (POSIX only), also from a separate process:
+                    python arduino_emulator.py
+
+Both can throttle the bytes to a baud rate, so timing measurements see the
+transfer time of the real 115200 bps link.
+"""
+
+import collections
+import os
+import select
+import threading
+import time
+
+import serial_protocol
+
+
+# Firmware states
+IDLE = 'IDLE'
+INIT = 'INIT'
+READY = 'READY'
+STREAM = 'STREAM'
+TIMEOUT = 'TIMEOUT'
+
+SERVO_NUM = 5 # 4 joints and the gripper
+
+
+class ArduinoEmulator():
+    def __init__(self, boot_time=0.5, ring_size=32, stream_timeout=None, history_size=100000):
+        # time from opening the port to the 'I' byte, the arduino resets on connection
+        self.boot_time = boot_time
+        # protocol 2 ring buffer size, the firmware RING_SIZE
+        self.ring_size = ring_size
+        # the firmware never enables its timeout timer, set seconds here to emulate it anyway
+        self.stream_timeout = stream_timeout
+
+        # servo pulse lengths and the (time, pulses) of every servo update
+        self.pulses = (0,) * SERVO_NUM
+        self.history = collections.deque(maxlen=history_size)
+        self.setpoint_count = 0
+        self.crc_errors = 0
+
+        self.reset(time.perf_counter())
+
+    """
+    ---------------------------------------------------------------
+     Functions below are called by the serial link, now is the
+     perf_counter time the bytes reach the emulator
+    ---------------------------------------------------------------
+    """
+
+    # restart the firmware, as the arduino does when the port opens
+    def reset(self, now):
+        self.state = IDLE
+        self.boot_at = now + self.boot_time
+        self.protocol = serial_protocol.PROTOCOL_V1
+        self.last_rx = now
+        # (time, bytes) sent to the PC
+        self.output = []
+
+        # protocol 1 receive buffer
+        self.rx_buffer = bytearray()
+
+        # protocol 2 ring buffer and frame parser
+        self.ring = collections.deque()
+        self.expected_seq = 0
+        self.playback_period = 1 / 30
+        self.last_playback = now
+        self.parser_buffer = bytearray()
+
+    # handle bytes from the PC, time driven transitions up to now are run first
+    def receive(self, data, now):
+        self.update(now)
+        self.last_rx = now
+
+        if self.state == READY:
+            for i, byte in enumerate(data):
+                signal = bytes((byte,))
+                if signal == serial_protocol.SIG_PC:
+                    self.protocol = serial_protocol.PROTOCOL_V1
+                    self._respond(serial_protocol.ACK_UNO, now)
+                elif signal == serial_protocol.SIG_PC_V2:
+                    self.protocol = serial_protocol.PROTOCOL_V2
+                    self._respond_v2(serial_protocol.ACK_V2, self.expected_seq - 1, now)
+                else:
+                    continue
+                self.state = STREAM
+                data = data[i + 1:]
+                break
+            else:
+                return
+
+        if self.state != STREAM:
+            # IDLE and INIT drain the receive buffer
+            return
+        if self.protocol == serial_protocol.PROTOCOL_V2:
+            self._receive_v2(data, now)
+        else:
+            self._receive_v1(data, now)
+
+    # run the boot, the protocol 2 playback and the stream timeout up to now
+    def update(self, now):
+        if self.state == IDLE and now >= self.boot_at:
+            # INIT clears the receive buffer and sends the init byte, then waits in READY
+            self.state = INIT
+            self.rx_buffer.clear()
+            self._respond(serial_protocol.INIT_UNO, self.boot_at)
+            self.state = READY
+
+        if self.state == STREAM:
+            while self.ring and self.last_playback + self.playback_period <= now:
+                self.last_playback += self.playback_period
+                self._set_servos(self.ring.popleft(), self.last_playback)
+
+            if self.stream_timeout is not None and now - self.last_rx >= self.stream_timeout:
+                # TIMEOUT falls back to IDLE, which restarts the handshake
+                self.state = TIMEOUT
+                timeout_at = self.last_rx + self.stream_timeout
+                self.reset(timeout_at)
+                self.boot_at = timeout_at
+                self.update(now)
+
+    # time of the next time driven transition, None when there is none
+    def next_event(self):
+        if self.state == IDLE:
+            return self.boot_at
+        events = []
+        if self.state == STREAM and self.ring:
+            events.append(self.last_playback + self.playback_period)
+        if self.state == STREAM and self.stream_timeout is not None:
+            events.append(self.last_rx + self.stream_timeout)
+        return min(events, default=None)
+
+    # hand the (time, bytes) responses to the serial link
+    def take_output(self):
+        output, self.output = self.output, []
+        return output
+
+    """
+    ---------------------------------------------------------------
+     Functions below decode the two protocols
+    ---------------------------------------------------------------
+    """
+
+    def _receive_v1(self, data, now):
+        self.rx_buffer += data
+        if len(self.rx_buffer) < serial_protocol.SETPOINT_SIZE:
+            return
+        setpoint = self.rx_buffer[:serial_protocol.SETPOINT_SIZE]
+        self._set_servos(self._decode_setpoint(setpoint), now)
+        # the firmware drains whatever else is in the receive buffer, then acknowledges
+        self.rx_buffer.clear()
+        self._respond(serial_protocol.ACK_UNO, now)
+
+    def _receive_v2(self, data, now):
+        buffer = self.parser_buffer
+        buffer += data
+        while True:
+            start = buffer.find(serial_protocol.HEADER)
+            if start < 0:
+                # keep a trailing first header byte, the second one may follow
+                del buffer[:-1 if buffer[-1:] == serial_protocol.HEADER[:1] else len(buffer)]
+                return
+            del buffer[:start]
+            if len(buffer) < 4:
+                return
+
+            count = buffer[3]
+            if count > serial_protocol.MAX_BATCH:
+                self._respond_v2(serial_protocol.NAK_V2, self.expected_seq, now)
+                del buffer[:2]
+                continue
+            frame_len = 2 + 4 + count * serial_protocol.SETPOINT_SIZE + 2
+            if len(buffer) < frame_len:
+                return
+            self._handle_frame(bytes(buffer[2:frame_len]), now)
+            del buffer[:frame_len]
+
+    def _handle_frame(self, frame, now):
+        seq, count = frame[0], frame[1]
+        crc = int.from_bytes(frame[-2:], 'big')
+        if serial_protocol.crc16_ccitt(frame[:-2]) != crc:
+            self.crc_errors += 1
+            self._respond_v2(serial_protocol.NAK_V2, self.expected_seq, now)
+            return
+        # a status poll, or a resent frame that was queued already
+        if count == 0 or (self.expected_seq - seq - 1) & 0xFF < 128:
+            self._respond_v2(serial_protocol.ACK_V2, self.expected_seq - 1, now)
+            return
+        # a frame went missing before this one, or it does not fit
+        if seq != self.expected_seq or count > self.ring_size - len(self.ring):
+            self._respond_v2(serial_protocol.NAK_V2, self.expected_seq, now)
+            return
+
+        if not self.ring:
+            # play the first setpoint right away
+            self.last_playback = now - self.playback_period
+        self.playback_period = int.from_bytes(frame[2:4], 'big') * 1e-6
+        for k in range(count):
+            start = 4 + k * serial_protocol.SETPOINT_SIZE
+            self.ring.append(self._decode_setpoint(frame[start:start + serial_protocol.SETPOINT_SIZE]))
+        self.expected_seq = (self.expected_seq + 1) & 0xFF
+        self._respond_v2(serial_protocol.ACK_V2, seq, now)
+        self.update(now)
+
+    @staticmethod
+    def _decode_setpoint(setpoint):
+        return tuple(int.from_bytes(setpoint[2*i:2*i + 2], 'big') for i in range(SERVO_NUM))
+
+    def _set_servos(self, pulses, now):
+        self.pulses = pulses
+        self.history.append((now, pulses))
+        self.setpoint_count += 1
+
+    def _respond(self, data, now):
+        self.output.append((now, data))
+
+    def _respond_v2(self, kind, seq, now):
+        self._respond(serial_protocol.encode_response(kind, seq, self.ring_size - len(self.ring)), now)
+
+
+class EmulatedSerial():
+    """
+    In-process stand-in for serial.Serial connected to an ArduinoEmulator.
+
+    Supports the part of the pyserial API robot_controller uses: read with
+    timeout, write, flush, in_waiting, the buffer resets and close. With a
+    baudrate the bytes take 10 bit times each to cross the link, plus latency.
+    """
+
+    def __init__(self, emulator=None, timeout=1, baudrate=115200, latency=0.0):
+        self.emulator = emulator if emulator is not None else ArduinoEmulator()
+        self.timeout = timeout
+        self.baudrate = baudrate
+        self.latency = latency
+        self._lock = threading.RLock()
+        self.open()
+
+    # (re)open the link, the emulated arduino resets like the real one does
+    def open(self):
+        with self._lock:
+            # bytes the PC can read, and the bytes still travelling in both directions as (arrival, bytes)
+            self._rx = bytearray()
+            self._rx_pending = collections.deque()
+            self._tx_pending = collections.deque()
+            # time each direction of the link finishes its current transfer
+            self._rx_link_free = 0.0
+            self._tx_link_free = 0.0
+            self.emulator.reset(time.perf_counter())
+            self.is_open = True
+
+    def _transfer_time(self, size):
+        return 0.0 if not self.baudrate else size * 10 / self.baudrate
+
+    # move the emulator and both directions of the link forward to now
+    def _advance(self, now):
+        while self._tx_pending and self._tx_pending[0][0] <= now:
+            arrival, data = self._tx_pending.popleft()
+            self.emulator.receive(data, arrival)
+        self.emulator.update(now)
+
+        for sent, data in self.emulator.take_output():
+            start = max(sent, self._rx_link_free)
+            self._rx_link_free = start + self._transfer_time(len(data))
+            self._rx_pending.append((self._rx_link_free + self.latency, data))
+        while self._rx_pending and self._rx_pending[0][0] <= now:
+            self._rx += self._rx_pending.popleft()[1]
+
+    # time of the next byte arrival or emulator transition
+    def _next_event(self):
+        events = [self.emulator.next_event()]
+        if self._tx_pending:
+            events.append(self._tx_pending[0][0])
+        if self._rx_pending:
+            events.append(self._rx_pending[0][0])
+        return min((event for event in events if event is not None), default=None)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        while True:
+            with self._lock:
+                now = time.perf_counter()
+                self._advance(now)
+                if len(self._rx) >= size or (deadline is not None and now >= deadline):
+                    data = bytes(self._rx[:size])
+                    del self._rx[:size]
+                    return data
+                wake = self._next_event()
+            # sleep until something can change, but wake up regularly for writes of other threads
+            wake = now + 0.01 if wake is None else min(wake, now + 0.01)
+            if deadline is not None:
+                wake = min(wake, deadline)
+            time.sleep(max(wake - time.perf_counter(), 0))
+
+    def write(self, data):
+        data = bytes(data)
+        with self._lock:
+            now = time.perf_counter()
+            self._advance(now)
+            start = max(now, self._tx_link_free)
+            self._tx_link_free = start + self._transfer_time(len(data))
+            self._tx_pending.append((self._tx_link_free + self.latency, data))
+            self._advance(now)
+        return len(data)
+
+    # like pyserial, wait until the written bytes left the PC
+    def flush(self):
+        time.sleep(max(self._tx_link_free - time.perf_counter(), 0))
+
+    @property
+    def in_waiting(self):
+        with self._lock:
+            self._advance(time.perf_counter())
+            return len(self._rx)
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._advance(time.perf_counter())
+            self._rx.clear()
+
+    def reset_output_buffer(self):
+        with self._lock:
+            self._tx_pending = collections.deque(item for item in self._tx_pending
+                                                 if item[0] - self.latency <= time.perf_counter())
+
+    def close(self):
+        self.is_open = False
+
+
+class PtyEmulator():
+    """
+    ArduinoEmulator behind a pseudo terminal, open port like a serial device.
+
+    A background thread shuttles the bytes between the pty and an
+    EmulatedSerial link, so baud rate throttling applies here as well.
+    The emulator resets whenever a program opens the port.
+    """
+
+    def __init__(self, emulator=None, baudrate=115200, latency=0.0):
+        self.link = EmulatedSerial(emulator, timeout=0, baudrate=baudrate, latency=latency)
+        self.emulator = self.link.emulator
+
+        # only the client keeps the slave side open, the master reports a hangup while it is closed
+        self._master, slave = os.openpty()
+        self.port = os.ttyname(slave)
+        os.close(slave)
+        self.connected = False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while self._running:
+            with self.link._lock:
+                self.link._advance(time.perf_counter())
+                wake = self.link._next_event()
+            timeout = 0.01 if wake is None else min(max(wake - time.perf_counter(), 0), 0.01)
+
+            readable, _, _ = select.select([self._master], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self._master, 4096)
+                except OSError:
+                    # no client has the port open
+                    self.connected = False
+                    time.sleep(0.01)
+                    continue
+            else:
+                data = b''
+
+            if not self.connected:
+                # a client opened the port, the arduino resets
+                self.connected = True
+                self.link.open()
+            if data:
+                self.link.write(data)
+
+            waiting = self.link.in_waiting
+            if waiting:
+                os.write(self._master, self.link.read(waiting))
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        os.close(self._master)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    # serve an emulated arduino until Ctrl-C, set robot_controller.com_port to the printed port
+    with PtyEmulator() as emulator:
+        print(f"Emulated arduino on {emulator.port}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
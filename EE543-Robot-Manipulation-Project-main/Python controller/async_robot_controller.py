@@ -0,0 +1,225 @@
+import asyncio
+import time
+import numpy as np
+import serial_protocol
+from robot_controller import robot_controller
+
+# pyserial-asyncio provides the asyncio serial transport
+try:
+    import serial_asyncio
+except ImportError:
+    serial_asyncio = None
+
+
+class AsyncRobotController(robot_controller):
+    """
+    asyncio version of robot_controller.
+
+    The robot parameters, kinematics and command encoding are inherited, the
+    serial link runs on an asyncio transport, so waiting for the 'A'
+    acknowledgement and pacing the moves never block the event loop.
+
+    Only protocol 1 is spoken, and there is no streaming mode: its sender
+    thread belongs to robot_controller. Run joints_goto as a task instead,
+    moves run one after the other.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        # asyncio stream pair of the serial link, created by communication_begin
+        self.reader = None
+        self.writer = None
+
+        # only one coroutine talks to the arduino at a time
+        self.serial_lock = asyncio.Lock()
+        # only one move runs at a time, a second one waits until the first has finished
+        self.motion_lock = asyncio.Lock()
+
+        # queues of the active state_stream subscribers
+        self.state_subscribers = set()
+        self.moving = False
+
+    """
+    ---------------------------------------------------------------
+     Functions below set up the serial communication
+    ---------------------------------------------------------------
+    """
+
+    async def communication_begin(self):
+        self._check_protocol()
+        if serial_asyncio is None:
+            raise ImportError("AsyncRobotController requires the pyserial-asyncio package")
+
+        self.reader, self.writer = await serial_asyncio.open_serial_connection(
+            url=self.com_port, baudrate=self.com_baudrate)
+        # Reset input/output buffer and wait for initialization
+        self.writer.transport.serial.reset_input_buffer()
+        self.writer.transport.serial.reset_output_buffer()
+        await asyncio.sleep(1)
+
+        # Wait for Arduino to initialize
+        while await self.reader.readexactly(1) != serial_protocol.INIT_UNO:
+            continue
+
+        # Send signaling byte
+        self.writer.write(serial_protocol.SIG_PC)
+        await self.writer.drain()
+        await asyncio.sleep(0.1)
+
+    async def communication_end(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    # wait for the acknowledgement byte the arduino sends when it is ready for the next command
+    async def wait_for_acknowledgement(self):
+        try:
+            ack = await asyncio.wait_for(self.reader.readexactly(1), self.com_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No acknowledgement from the arduino within {self.com_timeout} s") from None
+        return ack == serial_protocol.ACK_UNO
+
+    # send the command of the joint poses once the arduino acknowledged the previous one
+    # the encoded command is copied, the shared buffer may be reused while this coroutine waits
+    async def send_command(self, joint_poses):
+        return await self.send_frame(bytes(self.compose_command(joint_poses)))
+
+    # send the bytes of a composed command once the arduino acknowledged the previous one
+    async def send_frame(self, numbers):
+        self._check_protocol()
+        async with self.serial_lock:
+            if await self.wait_for_acknowledgement():
+                self.writer.write(bytes(numbers))
+                await self.writer.drain()
+                return True
+        return False
+
+    def _check_protocol(self):
+        if self.com_protocol != serial_protocol.PROTOCOL_V1:
+            raise NotImplementedError("AsyncRobotController only speaks the stop-and-wait protocol 1, "
+                                      f"com_protocol is {self.com_protocol}")
+
+    # the protocol 2 functions of robot_controller block on the serial port
+    def send_setpoints(self, frames):
+        self._check_protocol()
+
+    def wait_for_playback(self):
+        self._check_protocol()
+
+    """
+    ---------------------------------------------------------------
+     Functions below move the robot
+    ---------------------------------------------------------------
+    """
+
+    # Set the joint to the homing position
+    # Cautious: The robot will move rapidly if this is executed
+    async def joints_homing(self):
+        async with self.motion_lock:
+            self.robotstate_joint_poses = self.robot_homing_joint_poses.copy()
+            self.robotstate_gripper_close = False
+            self.robotstate_gripper_angle = self.gripper_open_angle
+            self.update_forward_kinematics()
+            await self.send_command(self.robotstate_joint_poses)
+            self._publish_state()
+
+    # this is the goto function in joint space
+    # input is the array of joint poses(in degree) and the arry of joint velocities(degree/s)
+    # optional joint accelerations(degree/s^2) switch to a synchronized profile
+    async def joints_goto(self, goals, speeds, accelerations=None, profile='trapezoid'):
+        # concurrent moves would interleave their frames on the link, the next one starts
+        # from where this one ends
+        async with self.motion_lock:
+            await self._joints_goto(goals, speeds, accelerations, profile)
+
+    async def _joints_goto(self, goals, speeds, accelerations, profile):
+        loop = asyncio.get_running_loop()
+        period = 1 / self.com_frequency
+        period_ns = int(1e9 / self.com_frequency)
+        next_tick = loop.time()
+
+        # precompute the joint poses of every period and the matching commands
+        trajectory = self.joints_goto_trajectory(self.robotstate_joint_poses, goals, speeds, accelerations, profile)
+        frames = self.compose_commands(trajectory)
+
+        self.moving = True
+        try:
+            for tick, (joint_poses, frame) in enumerate(zip(trajectory, frames)):
+                start = time.perf_counter_ns()
+                self.robotstate_joint_poses = joint_poses.copy()
+                self.update_forward_kinematics()
+                computed = time.perf_counter_ns()
+                await self.send_frame(frame)
+                sent = time.perf_counter_ns()
+                self.telemetry.record(start, computed - start, sent - computed, period_ns, first=tick == 0)
+                self._publish_state()
+
+                # sleep until the next communication period, other tasks run meanwhile
+                next_tick += period
+                await asyncio.sleep(max(0.0, next_tick - loop.time()))
+        finally:
+            self.moving = False
+            self._publish_state()
+
+    # 0 degree means the gripper is fully opened
+    # -90 degree menas the gripper is fully closed
+    async def gripper_set_angle(self, angle):
+        angle = np.clip(angle, self.gripper_close_angle, self.gripper_open_angle)
+        self.robotstate_gripper_angle = angle
+        self.robotstate_gripper_close = angle == self.gripper_close_angle
+        self.update_forward_kinematics()
+        await self.send_command(self.robotstate_joint_poses)
+        self._publish_state()
+
+    # 0% means the gripper is fully opened
+    # 100% menas the gripper is fully closed
+    async def gripper_set_percentage(self, percentage):
+        percentage = np.clip(percentage, 0, 100)
+        angle = percentage * (self.gripper_close_angle - self.gripper_open_angle) / 100
+        await self.gripper_set_angle(angle)
+
+    """
+    ---------------------------------------------------------------
+     Functions below publish the robot state
+    ---------------------------------------------------------------
+    """
+
+    def get_state(self):
+        state = super().get_state()
+        state['moving'] = self.moving
+        return state
+
+    # async generator of robot state snapshots, one per sent command
+    # a slow consumer only gets the latest snapshot, older ones are dropped
+    async def state_stream(self):
+        updates = asyncio.Queue(maxsize=1)
+        self.state_subscribers.add(updates)
+        try:
+            yield self.get_state()
+            while True:
+                yield await updates.get()
+        finally:
+            self.state_subscribers.discard(updates)
+
+    def _publish_state(self):
+        if not self.state_subscribers:
+            return
+        state = self.get_state()
+        for updates in self.state_subscribers:
+            if updates.full():
+                updates.get_nowait()
+            updates.put_nowait(state)
+
+    """
+    ---------------------------------------------------------------
+     The streaming mode of robot_controller runs a sender thread on
+     the blocking serial port, it has no asyncio version
+    ---------------------------------------------------------------
+    """
+
+    def _no_streaming(self, *args, **kwargs):
+        raise NotImplementedError("AsyncRobotController has no streaming mode, run joints_goto as a task, "
+                                  "moves are queued behind each other")
+
+    stream_begin = stream_end = stream_goto = stream_trajectory = _no_streaming
+    stream_gripper_set_percentage = stream_wait = _no_streaming
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the kinematics and control hot paths.
+
+Measures the cold import of AdelmanPy, single pose and batched FK, the
+workspace sweep, the command encoding, and the joints_goto and streaming loops of both serial protocols
+against the arduino emulator at the 115200 bps link speed. The results are
+written to a JSON file; compared with a baseline file, every metric that
+got worse by more than the tolerance is flagged and the exit code is 1.
+
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json
+
+Baselines depend on the machine, compare runs of the same computer only.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import AdelmanPy
+import robot_FK
+from arduino_emulator import ArduinoEmulator, EmulatedSerial
+from robot_controller import robot_controller
+from workspace_analysis import sample_workspace
+import serial_protocol
+
+
+def measure(function, repeat=1000, warmup=10):
+    """
+    Time repeated calls of a function.
+
+    Args:
+        function (callable): Called without arguments.
+        repeat (int): Number of timed calls.
+        warmup (int): Number of untimed calls made first.
+
+    Returns:
+        np.ndarray: The duration of every timed call in microseconds.
+    """
+
+    for _ in range(warmup):
+        function()
+    durations = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        function()
+        durations[i] = time.perf_counter_ns() - start
+    return durations / 1e3
+
+
+# better is 'lower', 'higher' or None for noisy metrics that are reported but never flagged
+def metric(value, unit, better='lower'):
+    return {'value': float(value), 'unit': unit, 'better': better}
+
+
+# run in a fresh interpreter, prints the seconds taken by the import and by the first call
+_IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import AdelmanPy
+imported = time.perf_counter()
+AdelmanPy.rotx(0.1)
+print(imported - start, time.perf_counter() - start)
+"""
+
+
+def bench_import(quick=False):
+    """
+    Time the cold start of AdelmanPy in new interpreters.
+
+    Returns:
+        dict: The median time of importing the package, and of importing it
+            and making the first call, which loads the submodule and NumPy
+            (and numba with the numba backend).
+    """
+
+    env = dict(os.environ, ADELMANPY_BACKEND=AdelmanPy.get_backend())
+
+    timings = []
+    for _ in range(3 if quick else 10):
+        output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), env=env).stdout
+        timings.append([float(value) for value in output.split()])
+    imported, first_call = np.median(timings, axis=0) * 1e3
+
+    return {
+        'adelmanpy_import_ms': metric(imported, 'ms'),
+        'adelmanpy_first_call_ms': metric(first_call, 'ms'),
+    }
+
+
+def bench_kinematics(quick=False):
+    rng = np.random.default_rng(0)
+    gamma = rng.uniform(-np.pi/2, np.pi/2, 5)
+    gammas = rng.uniform(-np.pi/2, np.pi/2, (10000 if quick else 100000, 5))
+
+    fk = measure(lambda: robot_FK.FK(gamma, return_frames=False), repeat=2000 if quick else 20000)
+    fk_frames = measure(lambda: robot_FK.FK(gamma), repeat=2000 if quick else 20000)
+    batch = measure(lambda: robot_FK.FK_batch(gammas), repeat=3, warmup=1)
+    jac = measure(lambda: robot_FK.jacobian(gamma), repeat=2000 if quick else 20000)
+
+    steps = 6 if quick else 10
+    sweep = measure(lambda: sample_workspace(steps=steps), repeat=1, warmup=1)
+
+    return {
+        'fk_single_us': metric(np.median(fk), 'us'),
+        'fk_single_frames_us': metric(np.median(fk_frames), 'us'),
+        'fk_batch_ns_per_pose': metric(np.median(batch) * 1e3 / len(gammas), 'ns'),
+        'jacobian_us': metric(np.median(jac), 'us'),
+        'workspace_sweep_ns_per_pose': metric(sweep[0] * 1e3 / steps**5, 'ns'),
+    }
+
+
+def bench_encoding(quick=False):
+    RC = robot_controller()
+    joint_poses = np.array([10.0, -20.0, 30.0, -40.0])
+    trajectory = np.linspace(-80, 80, 1000)[:, np.newaxis].repeat(RC.joint_num, axis=1)
+    repeat = 2000 if quick else 20000
+
+    def formula():
+        pulse_lengths = np.append(RC.angle_to_pulse_length(joint_poses),
+                                  RC.angle_to_pulse_length(RC.robotstate_gripper_angle))
+        return RC.pulse_length_to_byte(pulse_lengths)
+
+    encode = measure(lambda: RC.compose_command(joint_poses), repeat=repeat)
+    direct = measure(formula, repeat=repeat)
+    batch = measure(lambda: RC.compose_commands(trajectory), repeat=100)
+
+    return {
+        'encode_frame_us': metric(np.median(encode), 'us'),
+        'encode_formula_us': metric(np.median(direct), 'us'),
+        'encode_trajectory_ns_per_frame': metric(np.median(batch) * 1e3 / len(trajectory), 'ns'),
+    }
+
+
+def _emulated_controller(protocol, frequency):
+    emulator = ArduinoEmulator(boot_time=0.0)
+    RC = robot_controller()
+    RC.com_protocol = protocol
+    RC.com_frequency = frequency
+    RC.communication_begin(ser=EmulatedSerial(emulator, timeout=RC.com_timeout))
+    return RC, emulator
+
+
+def _played_timing(emulator, name):
+    # period statistics of the setpoints the emulated servos received
+    played = np.array([t for t, _ in emulator.history])
+    intervals = np.diff(played[1:]) * 1e6
+    return {
+        f'{name}_jitter_us': metric(np.std(intervals), 'us', better=None),
+        f'{name}_frequency_hz': metric(1e6 / np.mean(intervals), 'Hz', better='higher'),
+    }
+
+
+def bench_joints_goto(protocol, frequency, duration=1.0):
+    """
+    Run one joints_goto move of the first joint against the emulator.
+
+    Returns:
+        dict: How much longer than planned the move took, and the period
+            jitter and frequency of the setpoints the emulator played.
+    """
+
+    RC, emulator = _emulated_controller(protocol, frequency)
+    goals = np.zeros(RC.joint_num)
+    goals[0] = 45.0
+    speeds = np.full(RC.joint_num, goals[0] / duration)
+    planned = len(RC.joints_goto_trajectory(RC.robotstate_joint_poses, goals, speeds)) / frequency
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        RC.joints_goto(goals, speeds)
+    elapsed = time.perf_counter() - start
+    RC.communication_end()
+
+    name = f'joints_goto_v{protocol}_{frequency:g}hz'
+    results = {f'{name}_overrun_ms': metric(abs(elapsed - planned) * 1e3, 'ms', better=None)}
+    results.update(_played_timing(emulator, name))
+    return results
+
+
+def bench_stream_tick(protocol, frequency, duration=1.0):
+    """
+    Stream a move against the emulator and time the send of every tick.
+
+    Returns:
+        dict: The median and 99th percentile time the sender thread spends
+            sending one setpoint, and the timing of the played setpoints.
+    """
+
+    RC, emulator = _emulated_controller(protocol, frequency)
+    send = RC.send_frame
+    latencies = []
+
+    def timed_send(numbers):
+        start = time.perf_counter_ns()
+        result = send(numbers)
+        latencies.append(time.perf_counter_ns() - start)
+        return result
+    RC.send_frame = timed_send
+
+    goals = np.zeros(RC.joint_num)
+    goals[0] = 45.0
+    RC.stream_begin()
+    RC.stream_goto(goals, np.full(RC.joint_num, goals[0] / duration))
+    RC.stream_wait()
+    RC.stream_end()
+    if protocol == serial_protocol.PROTOCOL_V2:
+        RC.wait_for_playback()
+    RC.communication_end()
+
+    name = f'stream_v{protocol}_{frequency:g}hz'
+    results = {
+        f'{name}_tick_latency_us': metric(np.median(latencies) / 1e3, 'us'),
+        f'{name}_tick_latency_p99_us': metric(np.percentile(latencies, 99) / 1e3, 'us', better=None),
+    }
+    results.update(_played_timing(emulator, name))
+    return results
+
+
+def run(quick=False):
+    results = {}
+    results.update(bench_import(quick))
+    results.update(bench_kinematics(quick))
+    results.update(bench_encoding(quick))
+    duration = 0.5 if quick else 1.0
+    results.update(bench_joints_goto(serial_protocol.PROTOCOL_V1, 30, duration))
+    results.update(bench_joints_goto(serial_protocol.PROTOCOL_V2, 100, duration))
+    results.update(bench_stream_tick(serial_protocol.PROTOCOL_V1, 30, duration))
+    results.update(bench_stream_tick(serial_protocol.PROTOCOL_V2, 100, duration))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find the metrics that got worse than the baseline by more than tolerance.
+
+    Returns:
+        list: The names of the regressed metrics.
+    """
+
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if result['better'] is None or reference is None or reference['value'] == 0:
+            continue
+        change = result['value'] / reference['value'] - 1
+        if result['better'] == 'higher':
+            change = -change
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative change that counts as a regression (default 0.25)')
+    parser.add_argument('--quick', action='store_true', help='fewer repetitions and smaller sweeps')
+    parser.add_argument('--backend', choices=AdelmanPy.backend.BACKENDS,
+                        help='kernel backend of FK and AdelmanPy (default: numpy)')
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        AdelmanPy.set_backend(args.backend)
+
+    results = run(args.quick)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+
+    for name, result in results.items():
+        line = f"{name:45s} {result['value']:12.3f} {result['unit']}"
+        if name in baseline:
+            line += f"   baseline {baseline[name]['value']:12.3f}"
+            if name in regressions:
+                line += '   REGRESSION'
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'numpy': np.__version__, 'backend': AdelmanPy.get_backend(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'results': results}, f, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
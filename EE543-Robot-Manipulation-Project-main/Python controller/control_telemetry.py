@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timing telemetry of the robot_controller control loop.
+
+Every tick of joints_goto and of the streaming thread records, from
+time.perf_counter_ns, when it started, how long computing the setpoint
+took, how long sending it took (for protocol 1 that includes waiting for
+the 'A' acknowledgement, the serial round trip) and whether it overran its
+communication period. The records live in a fixed size ring buffer, so the
+telemetry can stay enabled in production; summary() condenses them into the
+achieved frequency, jitter and latency percentiles, and they can be dumped
+to CSV or the Prometheus text format.
+"""
+
+import threading
+
+import numpy as np
+
+
+TICK_DTYPE = np.dtype([
+    ('start_ns', np.int64),    # perf_counter_ns at the start of the tick
+    ('compute_ns', np.int64),  # setpoint and forward kinematics update
+    ('send_ns', np.int64),     # serial send, including the wait for the acknowledgement
+    ('setpoints', np.int32),   # setpoints sent in the tick, more than 1 for protocol 2 batches
+    ('missed', np.bool_),      # the tick took longer than its period
+    ('first', np.bool_),       # first tick of a move, the idle time before it is not a period
+])
+
+
+class ControlTelemetry():
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.ticks = np.zeros(capacity, dtype=TICK_DTYPE)
+        # totals since the last reset, the ring buffer only keeps the last capacity ticks
+        self.tick_count = 0
+        self.missed_count = 0
+        self.compute_total_ns = 0
+        self.send_total_ns = 0
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.tick_count = 0
+            self.missed_count = 0
+            self.compute_total_ns = 0
+            self.send_total_ns = 0
+
+    # store one tick, all times are perf_counter_ns values or differences of them
+    def record(self, start_ns, compute_ns, send_ns, period_ns, setpoints=1, first=False):
+        missed = compute_ns + send_ns > period_ns
+        with self.lock:
+            self.ticks[self.tick_count % self.capacity] = (start_ns, compute_ns, send_ns, setpoints, missed, first)
+            self.tick_count += 1
+            self.missed_count += missed
+            self.compute_total_ns += compute_ns
+            self.send_total_ns += send_ns
+
+    # the buffered ticks, oldest first
+    def snapshot(self):
+        with self.lock:
+            count = min(self.tick_count, self.capacity)
+            oldest = self.tick_count % self.capacity if self.tick_count > self.capacity else 0
+            return np.roll(self.ticks, -oldest)[:count]
+
+    def summary(self):
+        """
+        Condense the buffered ticks into timing statistics.
+
+        Returns:
+            dict: Tick and missed deadline totals, the achieved setpoint
+                frequency (Hz), the jitter of the tick period and the mean,
+                99th percentile and maximum compute and send times (ms).
+        """
+
+        ticks = self.snapshot()
+        summary = {'ticks': self.tick_count, 'missed_deadlines': self.missed_count}
+        if len(ticks) == 0:
+            return summary
+
+        # tick periods within the moves, the setpoints of a tick were sent during its period
+        periods = np.diff(ticks['start_ns']) / 1e6
+        within_move = ~ticks['first'][1:]
+        if np.any(within_move):
+            periods = periods[within_move]
+            summary['frequency_hz'] = float(ticks['setpoints'][:-1][within_move].sum() / (periods.sum() / 1e3))
+            summary['period_jitter_ms'] = float(periods.std())
+        for field in ('compute', 'send'):
+            durations = ticks[f'{field}_ns'] / 1e6
+            summary[f'{field}_mean_ms'] = float(durations.mean())
+            summary[f'{field}_p99_ms'] = float(np.percentile(durations, 99))
+            summary[f'{field}_max_ms'] = float(durations.max())
+        return summary
+
+    def to_csv(self, path):
+        ticks = self.snapshot()
+        np.savetxt(path, np.column_stack([ticks[name] for name in TICK_DTYPE.names]),
+                   fmt='%d', delimiter=',', header=','.join(TICK_DTYPE.names), comments='')
+
+    def to_prometheus(self, prefix='robot_control'):
+        """
+        Format the telemetry in the Prometheus text exposition format.
+
+        Returns:
+            str: Counters of ticks and missed deadlines, gauges of the frequency
+                and jitter and summaries of the compute and send times (seconds).
+                The gauges and the quantiles cover the buffered ticks, the
+                _sum and _count of the summaries every tick since the last reset.
+        """
+
+        with self.lock:
+            totals = {'compute': self.compute_total_ns, 'send': self.send_total_ns}
+            count = self.tick_count
+        summary = self.summary()
+        ticks = self.snapshot()
+        lines = [
+            f'# HELP {prefix}_ticks_total Control loop ticks.',
+            f'# TYPE {prefix}_ticks_total counter',
+            f'{prefix}_ticks_total {summary["ticks"]}',
+            f'# HELP {prefix}_missed_deadlines_total Ticks that took longer than the communication period.',
+            f'# TYPE {prefix}_missed_deadlines_total counter',
+            f'{prefix}_missed_deadlines_total {summary["missed_deadlines"]}',
+        ]
+        if 'frequency_hz' in summary:
+            lines += [
+                f'# HELP {prefix}_frequency_hertz Achieved setpoint frequency of the buffered ticks.',
+                f'# TYPE {prefix}_frequency_hertz gauge',
+                f'{prefix}_frequency_hertz {summary["frequency_hz"]:.6g}',
+                f'# HELP {prefix}_period_jitter_seconds Standard deviation of the tick period.',
+                f'# TYPE {prefix}_period_jitter_seconds gauge',
+                f'{prefix}_period_jitter_seconds {summary["period_jitter_ms"] / 1e3:.6g}',
+            ]
+        for field, description in (('compute', 'Setpoint computation time'),
+                                   ('send', 'Serial send time including the acknowledgement')):
+            name = f'{prefix}_{field}_seconds'
+            durations = ticks[f'{field}_ns'] / 1e9
+            lines += [f'# HELP {name} {description}.', f'# TYPE {name} summary']
+            if len(durations):
+                for quantile in (0.5, 0.9, 0.99):
+                    lines.append(f'{name}{{quantile="{quantile}"}} {np.quantile(durations, quantile):.6g}')
+            lines += [f'{name}_sum {totals[field] / 1e9:.9g}', f'{name}_count {count}']
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Voxelized reachability map of the 5 rotary joint robot.
+
+The joint space sweep of workspace_analysis is binned into a 3-D voxel grid.
+Every voxel stores how many sampled configurations reach it and keeps up to
+max_per_voxel of those joint vectors, so "is this point reachable, and
+roughly with which joints?" is a constant time lookup. Maps are saved to a
+compressed .npz file keyed by a hash of the DH parameters and the sweep
+settings, and loaded from there on later runs.
+"""
+
+import hashlib
+import math
+import os
+
+import numpy as np
+import robot_FK
+from robot_FK import FK_batch
+from workspace_analysis import CHUNK_SIZE, JOINT_RANGES, joint_grid_chunks, workspace_bounds
+
+
+# Default folder the reachability maps are cached in
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reachability_cache')
+
+
+class ReachabilityMap():
+    def __init__(self, origin, voxel_size, shape, counts, voxel_keys, offsets, configurations):
+        # lower corner of the first voxel and the edge length of every voxel
+        self.origin = np.asarray(origin, dtype=float)
+        self.voxel_size = float(voxel_size)
+        self.shape = tuple(int(n) for n in shape)
+
+        # number of sampled configurations that reach each voxel
+        self.counts = counts.reshape(self.shape)
+
+        # the stored joint vectors grouped by voxel, the configurations of the
+        # voxel voxel_keys[i] are configurations[offsets[i]:offsets[i+1]]
+        self.voxel_keys = voxel_keys
+        self.offsets = offsets
+        self.configurations = configurations
+
+        # flat views used by the scalar queries
+        self._counts_flat = self.counts.reshape(-1)
+        self._origin = tuple(float(x) for x in self.origin)
+
+    """
+    ---------------------------------------------------------------
+     Functions below build, save and load the map
+    ---------------------------------------------------------------
+    """
+
+    @classmethod
+    def build(cls, joint_ranges=JOINT_RANGES, steps=10, voxel_size=0.05,
+              max_per_voxel=8, chunk_size=CHUNK_SIZE):
+        """
+        Sweep a joint space grid and bin the end-effector positions into voxels.
+
+        Args:
+            joint_ranges (np.ndarray): A 5x2 array of [min, max] joint angles.
+            steps (int or sequence): Number of grid samples per joint.
+            voxel_size (float): Edge length of a voxel, in the DH length unit.
+            max_per_voxel (int): Number of joint vectors kept per voxel.
+            chunk_size (int): Number of joint vectors evaluated per FK_batch call.
+
+        Returns:
+            ReachabilityMap: The map of the sweep.
+        """
+
+        # the end effector never leaves the sphere spanned by the link offsets
+        reach = workspace_bounds()[0, 1]
+        cells = int(math.ceil(2 * reach / voxel_size)) + 1
+        shape = (cells, cells, cells)
+        origin = np.full(3, -reach - voxel_size / 2)
+
+        counts = np.zeros(cells ** 3, dtype=np.int64)
+        kept_keys, kept_configurations = [], []
+
+        for _, gammas in joint_grid_chunks(joint_ranges, steps, chunk_size):
+            positions = FK_batch(gammas)[:, :3, 3]
+            subscripts = np.floor((positions - origin) / voxel_size).astype(np.int64)
+            subscripts = np.clip(subscripts, 0, cells - 1)
+            keys = np.ravel_multi_index(subscripts.T, shape)
+
+            # rank every sample within its voxel to keep the first max_per_voxel
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            group_start = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            group_size = np.diff(np.r_[group_start, len(sorted_keys)])
+            rank = np.arange(len(sorted_keys)) - np.repeat(group_start, group_size)
+            keep = order[counts[sorted_keys] + rank < max_per_voxel]
+
+            kept_keys.append(keys[keep])
+            kept_configurations.append(gammas[keep].astype(np.float32))
+            counts += np.bincount(keys, minlength=len(counts))
+
+        # group the kept joint vectors by voxel
+        keys = np.concatenate(kept_keys)
+        order = np.argsort(keys, kind='stable')
+        voxel_keys, first = np.unique(keys[order], return_index=True)
+        offsets = np.r_[first, len(keys)].astype(np.int64)
+        configurations = np.concatenate(kept_configurations)[order]
+
+        return cls(origin, voxel_size, shape, counts, voxel_keys, offsets, configurations)
+
+    def save(self, path):
+        # store the map as a compressed .npz file
+        np.savez_compressed(path, origin=self.origin, voxel_size=self.voxel_size,
+                            shape=np.array(self.shape), counts=self._counts_flat,
+                            voxel_keys=self.voxel_keys, offsets=self.offsets,
+                            configurations=self.configurations)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['origin'], data['voxel_size'], data['shape'], data['counts'],
+                       data['voxel_keys'], data['offsets'], data['configurations'])
+
+    @classmethod
+    def load_or_build(cls, joint_ranges=JOINT_RANGES, steps=10, voxel_size=0.05,
+                      max_per_voxel=8, cache_dir=CACHE_DIR):
+        """
+        Load the map of these settings from the cache, building it if needed.
+
+        Args:
+            joint_ranges (np.ndarray): A 5x2 array of [min, max] joint angles.
+            steps (int or sequence): Number of grid samples per joint.
+            voxel_size (float): Edge length of a voxel, in the DH length unit.
+            max_per_voxel (int): Number of joint vectors kept per voxel.
+            cache_dir (str): Folder the compressed maps are stored in.
+
+        Returns:
+            ReachabilityMap: The cached or freshly built map.
+        """
+
+        key = cache_key(joint_ranges, steps, voxel_size, max_per_voxel)
+        path = os.path.join(cache_dir, f'reachability_{key}.npz')
+        if os.path.exists(path):
+            return cls.load(path)
+
+        reachability = cls.build(joint_ranges, steps, voxel_size, max_per_voxel)
+        os.makedirs(cache_dir, exist_ok=True)
+        reachability.save(path)
+        return reachability
+
+    """
+    ---------------------------------------------------------------
+     Functions below answer the reachability queries
+    ---------------------------------------------------------------
+    """
+
+    # input: a Cartesian point [x, y, z]
+    # output: the flat voxel index, or -1 when the point is outside the grid
+    def voxel_index(self, point):
+        nx, ny, nz = self.shape
+        i = math.floor((point[0] - self._origin[0]) / self.voxel_size)
+        j = math.floor((point[1] - self._origin[1]) / self.voxel_size)
+        k = math.floor((point[2] - self._origin[2]) / self.voxel_size)
+        if 0 <= i < nx and 0 <= j < ny and 0 <= k < nz:
+            return (i * ny + j) * nz + k
+        return -1
+
+    def is_reachable(self, point):
+        index = self.voxel_index(point)
+        return index >= 0 and self._counts_flat[index] > 0
+
+    # output: an (M, 5) array of joint vectors that reach the voxel of the point
+    def configurations_at(self, point):
+        index = self.voxel_index(point)
+        slot = np.searchsorted(self.voxel_keys, index)
+        if index < 0 or slot == len(self.voxel_keys) or self.voxel_keys[slot] != index:
+            return self.configurations[:0]
+        return self.configurations[self.offsets[slot]:self.offsets[slot + 1]]
+
+    # vectorized version of is_reachable for an (N, 3) array of points
+    def is_reachable_batch(self, points):
+        subscripts = np.floor((np.asarray(points) - self.origin) / self.voxel_size).astype(np.int64)
+        inside = np.all((subscripts >= 0) & (subscripts < self.shape), axis=1)
+        reachable = np.zeros(len(subscripts), dtype=bool)
+        keys = np.ravel_multi_index(subscripts[inside].T, self.shape)
+        reachable[inside] = self._counts_flat[keys] > 0
+        return reachable
+
+
+def cache_key(joint_ranges, steps, voxel_size, max_per_voxel):
+    """
+    Hash the DH parameters and sweep settings that define a reachability map.
+
+    Returns:
+        str: A hexadecimal digest used in the cache file name.
+    """
+
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(robot_FK.DH_PARAMS, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(joint_ranges, dtype=float).tobytes())
+    digest.update(np.broadcast_to(steps, (len(joint_ranges),)).astype(np.int64).tobytes())
+    digest.update(repr((float(voxel_size), int(max_per_voxel))).encode())
+    return digest.hexdigest()[:16]
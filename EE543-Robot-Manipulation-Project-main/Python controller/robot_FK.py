@@ -6,51 +6,322 @@ Created on Thu Feb 27 18:10:21 2025
 @author: ian
 """
 
+import math
 import numpy as np
-import AdelmanPy as ap
+from AdelmanPy import backend
 
 
-def FK(gamma):
+# Placeholder DH parameters [a, alpha, d], theta is supplied by the joint vector
+DH_PARAMS = np.array([
+    [1, 0, 0],  # Joint 1
+    [1, np.pi/2, 0],  # Joint 2
+    [1, 0, 0],  # Joint 3
+    [1, 0, 0],  # Joint 4
+    [1, 0, 0]  # Joint 5
+])
+
+
+def _precompute_links(dh_params):
+    """
+    Precompute the theta independent terms of every link transformation.
+
+    Args:
+        dh_params (np.ndarray): A 5x3 array of DH parameters [a, alpha, d].
+
+    Returns:
+        tuple: One (cos(a), sin(a), cos(alpha), sin(alpha), d) tuple per link.
+    """
+
+    return tuple(
+        (math.cos(a), math.sin(a), math.cos(alpha), math.sin(alpha), float(d))
+        for a, alpha, d in dh_params
+    )
+
+
+# Constant part of each link transform, evaluated once at import
+_LINK_CONSTANTS = _precompute_links(DH_PARAMS)
+_LINK_ARRAY = np.array(_LINK_CONSTANTS)
+
+# frames argument of _fk_kernel when the link frames are not returned
+_NO_FRAMES = np.empty((0, 4, 4))
+
+# Axis of every joint in the previous frame, rotx(alpha) @ [0, 1, 0]
+_JOINT_AXES = np.column_stack((np.zeros(len(DH_PARAMS)), np.cos(DH_PARAMS[:, 1]), np.sin(DH_PARAMS[:, 1])))
+
+
+def FK(gamma, out=None, return_frames=True):
     """
     Calculate the forward kinematics of a 5 rotary joint robot using DH convention.
 
+    Every link transform Hrotx(alpha) @ Hroty(theta) @ Hrotz(a) @ [translation
+    of d along x] is evaluated from its precomputed closed form and chained
+    with scalar arithmetic, so no intermediate arrays are allocated. With the
+    numba backend (AdelmanPy.set_backend) the same arithmetic runs compiled
+    in _fk_kernel.
+
     Args:
         gamma (np.ndarray): A 5x1 vector of joint angles [theta1, theta2, theta3, theta4, theta5].
+        out (np.ndarray, optional): A preallocated 4x4 array the end-effector
+            pose is written into.
+        return_frames (bool): Build and return the individual link
+            transformation matrices. Disable it when only the end pose is needed.
 
     Returns:
         np.ndarray: A 4x4 homogeneous transformation matrix representing the end-effector pose.
+        list: The 4x4 transformation matrix of each joint, only returned when
+            return_frames is True.
     """
-    
-    # Placeholder DH parameters [a, alpha, d, theta]
-    dh_params = [
-        [1, 0, 0, gamma[0]],  # Joint 1
-        [1, np.pi/2, 0, gamma[1]],  # Joint 2
-        [1, 0, 0, gamma[2]],  # Joint 3
-        [1, 0, 0, gamma[3]],  # Joint 4
-        [1, 0, 0, gamma[4]]  # Joint 5
-    ]
-
-    # Initialize transformation matrix
-    T = np.eye(4)
+
+    if backend.name == 'numba':
+        T = np.empty((4, 4)) if out is None else out
+        frames = np.empty((len(_LINK_CONSTANTS), 4, 4)) if return_frames else _NO_FRAMES
+        backend.compiled(_fk_kernel)(np.asarray(gamma, dtype=float).reshape(-1), _LINK_ARRAY, T, frames)
+        if return_frames:
+            return T, list(frames)
+        return T
+
+    # Running rotation R and position p of the overall transformation
+    r00, r01, r02 = 1.0, 0.0, 0.0
+    r10, r11, r12 = 0.0, 1.0, 0.0
+    r20, r21, r22 = 0.0, 0.0, 1.0
+    p0 = p1 = p2 = 0.0
 
     # Initialize a list to store individual transformation matrices
-    T_matrices = []
+    T_matrices = [] if return_frames else None
 
     # Compute the transformation matrix for each joint
-    for a, alpha, d, theta in dh_params:
-        # Compute the transformation matrix for the current joint
-        T_joint = ap.Hrotx(alpha) @ ap.Hroty(theta) @ ap.Hrotz(a) @ np.array([[1, 0, 0, d], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+    for (cz, sz, ca, sa, d), theta in zip(_LINK_CONSTANTS, gamma):
+        ct, st = math.cos(theta), math.sin(theta)
+
+        # Rotation of the current joint, rotx(alpha) @ roty(theta) @ rotz(a)
+        l00, l01, l02 = ct * cz, -ct * sz, st
+        l10, l11, l12 = ca * sz + sa * st * cz, ca * cz - sa * st * sz, -sa * ct
+        l20, l21, l22 = sa * sz - ca * st * cz, sa * cz + ca * st * sz, ca * ct
+
+        # Translation of the current joint, the rotated offset d along x
+        t0, t1, t2 = d * l00, d * l10, d * l20
+
         # Update the overall transformation matrix
-        T = T @ T_joint
+        p0 += r00 * t0 + r01 * t1 + r02 * t2
+        p1 += r10 * t0 + r11 * t1 + r12 * t2
+        p2 += r20 * t0 + r21 * t1 + r22 * t2
+        r00, r01, r02 = (r00 * l00 + r01 * l10 + r02 * l20,
+                         r00 * l01 + r01 * l11 + r02 * l21,
+                         r00 * l02 + r01 * l12 + r02 * l22)
+        r10, r11, r12 = (r10 * l00 + r11 * l10 + r12 * l20,
+                         r10 * l01 + r11 * l11 + r12 * l21,
+                         r10 * l02 + r11 * l12 + r12 * l22)
+        r20, r21, r22 = (r20 * l00 + r21 * l10 + r22 * l20,
+                         r20 * l01 + r21 * l11 + r22 * l21,
+                         r20 * l02 + r21 * l12 + r22 * l22)
+
         # Store the current joint's transformation matrix
-        T_matrices.append(T_joint)
+        if return_frames:
+            T_matrices.append(np.array([[l00, l01, l02, t0],
+                                        [l10, l11, l12, t1],
+                                        [l20, l21, l22, t2],
+                                        [0.0, 0.0, 0.0, 1.0]]))
 
     # T is the final transformation matrix representing the end-effector pose
+    T = np.empty((4, 4)) if out is None else out
+    T[0, 0], T[0, 1], T[0, 2], T[0, 3] = r00, r01, r02, p0
+    T[1, 0], T[1, 1], T[1, 2], T[1, 3] = r10, r11, r12, p1
+    T[2, 0], T[2, 1], T[2, 2], T[2, 3] = r20, r21, r22, p2
+    T[3, 0], T[3, 1], T[3, 2], T[3, 3] = 0.0, 0.0, 0.0, 1.0
+
     # T_matrices is a list of individual transformation matrices for each joint
     # T_matrices should have 5 elements, one for each joint
-    return T, T_matrices
+    if return_frames:
+        return T, T_matrices
+    return T
+
+
+def _fk_kernel(gamma, links, T, frames):
+    # FK compiled by the numba backend, links holds the _LINK_CONSTANTS rows,
+    # the link transforms are written into frames unless it is empty
+    r00, r01, r02 = 1.0, 0.0, 0.0
+    r10, r11, r12 = 0.0, 1.0, 0.0
+    r20, r21, r22 = 0.0, 0.0, 1.0
+    p0 = p1 = p2 = 0.0
+
+    for i in range(links.shape[0]):
+        cz, sz, ca, sa, d = links[i, 0], links[i, 1], links[i, 2], links[i, 3], links[i, 4]
+        ct, st = math.cos(gamma[i]), math.sin(gamma[i])
+
+        l00, l01, l02 = ct * cz, -ct * sz, st
+        l10, l11, l12 = ca * sz + sa * st * cz, ca * cz - sa * st * sz, -sa * ct
+        l20, l21, l22 = sa * sz - ca * st * cz, sa * cz + ca * st * sz, ca * ct
+        t0, t1, t2 = d * l00, d * l10, d * l20
+
+        p0 += r00 * t0 + r01 * t1 + r02 * t2
+        p1 += r10 * t0 + r11 * t1 + r12 * t2
+        p2 += r20 * t0 + r21 * t1 + r22 * t2
+        r00, r01, r02 = (r00 * l00 + r01 * l10 + r02 * l20,
+                         r00 * l01 + r01 * l11 + r02 * l21,
+                         r00 * l02 + r01 * l12 + r02 * l22)
+        r10, r11, r12 = (r10 * l00 + r11 * l10 + r12 * l20,
+                         r10 * l01 + r11 * l11 + r12 * l21,
+                         r10 * l02 + r11 * l12 + r12 * l22)
+        r20, r21, r22 = (r20 * l00 + r21 * l10 + r22 * l20,
+                         r20 * l01 + r21 * l11 + r22 * l21,
+                         r20 * l02 + r21 * l12 + r22 * l22)
+
+        if frames.shape[0]:
+            F = frames[i]
+            F[0, 0], F[0, 1], F[0, 2], F[0, 3] = l00, l01, l02, t0
+            F[1, 0], F[1, 1], F[1, 2], F[1, 3] = l10, l11, l12, t1
+            F[2, 0], F[2, 1], F[2, 2], F[2, 3] = l20, l21, l22, t2
+            F[3, 0], F[3, 1], F[3, 2], F[3, 3] = 0.0, 0.0, 0.0, 1.0
+
+    T[0, 0], T[0, 1], T[0, 2], T[0, 3] = r00, r01, r02, p0
+    T[1, 0], T[1, 1], T[1, 2], T[1, 3] = r10, r11, r12, p1
+    T[2, 0], T[2, 1], T[2, 2], T[2, 3] = r20, r21, r22, p2
+    T[3, 0], T[3, 1], T[3, 2], T[3, 3] = 0.0, 0.0, 0.0, 1.0
+
+
+def link_transforms(thetas, dh_params=DH_PARAMS):
+    """
+    Calculate the individual link transformation matrices for stacked joint vectors.
+
+    Each link transform is the closed form of
+    Hrotx(alpha) @ Hroty(theta) @ Hrotz(a) @ [translation of d along x],
+    evaluated for every sample and every link in a single NumPy pass.
+
+    Args:
+        thetas (np.ndarray): An (..., 5) array of joint angles.
+        dh_params (np.ndarray, optional): The [a, alpha, d] rows of the links,
+            one per joint angle, DH_PARAMS by default.
+
+    Returns:
+        np.ndarray: An (..., 5, 4, 4) array of link transformation matrices.
+    """
+
+    thetas = np.asarray(thetas, dtype=float)
+    dh_params = np.asarray(dh_params, dtype=float)
+    a, alpha, d = dh_params[:, 0], dh_params[:, 1], dh_params[:, 2]
+
+    ct, st = np.cos(thetas), np.sin(thetas)
+    ca, sa = np.cos(alpha), np.sin(alpha)
+    cz, sz = np.cos(a), np.sin(a)
+
+    T = np.zeros(thetas.shape + (4, 4))
+
+    # Rotation part, rotx(alpha) @ roty(theta) @ rotz(a)
+    T[..., 0, 0] = ct * cz
+    T[..., 0, 1] = -ct * sz
+    T[..., 0, 2] = st
+    T[..., 1, 0] = ca * sz + sa * st * cz
+    T[..., 1, 1] = ca * cz - sa * st * sz
+    T[..., 1, 2] = -sa * ct
+    T[..., 2, 0] = sa * sz - ca * st * cz
+    T[..., 2, 1] = sa * cz + ca * st * sz
+    T[..., 2, 2] = ca * ct
+
+    # Translation part, the rotated offset d along the x axis
+    T[..., :3, 3] = d[:, np.newaxis] * T[..., :3, 0]
+    T[..., 3, 3] = 1
+
+    return T
+
+
+def FK_batch(gammas, return_frames=False):
+    """
+    Calculate the forward kinematics for many joint configurations at once.
+
+    Args:
+        gammas (np.ndarray): An (N, 5) array of joint angle vectors.
+        return_frames (bool): Also return the individual link transformation
+            matrices, the batched equivalent of T_matrices from FK.
+
+    Returns:
+        np.ndarray: An (N, 4, 4) array of end-effector poses.
+        np.ndarray: An (N, 5, 4, 4) array of link transformation matrices,
+            only returned when return_frames is True.
+    """
+
+    gammas = np.atleast_2d(np.asarray(gammas, dtype=float))
+    frames = link_transforms(gammas)
+
+    # Chain the links, the loop runs over the 5 joints and never over samples
+    T = frames[:, 0].copy()
+    for i in range(1, frames.shape[1]):
+        T = T @ frames[:, i]
+
+    if return_frames:
+        return T, frames
+    return T
+
+
+def jacobian(gamma, T_matrices=None):
+    """
+    Calculate the geometric Jacobian of the end effector.
+
+    Joint i rotates about the y axis of the frame Hrotx(alpha_i) applied to the
+    previous frame, and that axis passes through the previous frame origin.
+    The axes and origins are read off the link frames FK already builds, so
+    the Jacobian costs a single pass over the joints.
+
+    Args:
+        gamma (np.ndarray): A 5x1 vector of joint angles.
+        T_matrices (list, optional): The link transformation matrices FK
+            returned for gamma, computed when not given.
+
+    Returns:
+        np.ndarray: A 6x5 Jacobian, linear velocity rows first.
+    """
+
+    if T_matrices is None:
+        _, T_matrices = FK(gamma)
+
+    n = len(T_matrices)
+    axes = np.empty((n, 3))
+    origins = np.empty((n, 3))
+
+    T = np.eye(4)
+    for i, T_joint in enumerate(T_matrices):
+        origins[i] = T[:3, 3]
+        # the joint axis is R_prev @ rotx(alpha) @ [0, 1, 0]
+        axes[i] = T[:3, :3] @ _JOINT_AXES[i]
+        T = T @ T_joint
+
+    # linear part, axis x (end-effector position - axis origin), written out
+    # element wise because np.cross is slow on tiny arrays
+    r = T[:3, 3] - origins
+    J = np.empty((6, n))
+    J[0] = axes[:, 1] * r[:, 2] - axes[:, 2] * r[:, 1]
+    J[1] = axes[:, 2] * r[:, 0] - axes[:, 0] * r[:, 2]
+    J[2] = axes[:, 0] * r[:, 1] - axes[:, 1] * r[:, 0]
+    J[3:] = axes.T
+    return J
+
+
+def jacobian_batch(gammas, frames=None):
+    """
+    Calculate the geometric Jacobian for many joint configurations at once.
+
+    Args:
+        gammas (np.ndarray): An (N, 5) array of joint angle vectors.
+        frames (np.ndarray, optional): The (N, 5, 4, 4) link frames FK_batch
+            returned for gammas, computed when not given.
 
+    Returns:
+        np.ndarray: An (N, 6, 5) array of Jacobians, linear velocity rows first.
+    """
 
+    if frames is None:
+        _, frames = FK_batch(gammas, return_frames=True)
 
+    # prefix products, the frame each joint axis is expressed in
+    N, n = frames.shape[:2]
+    prefix = np.empty((N, n + 1, 4, 4))
+    prefix[:, 0] = np.eye(4)
+    for i in range(n):
+        np.matmul(prefix[:, i], frames[:, i], out=prefix[:, i + 1])
 
+    axes = np.einsum('knij,nj->kni', prefix[:, :-1, :3, :3], _JOINT_AXES)
+    r = prefix[:, -1:, :3, 3] - prefix[:, :-1, :3, 3]
 
+    J = np.empty((N, 6, n))
+    J[:, :3] = np.cross(axes, r).transpose(0, 2, 1)
+    J[:, 3:] = axes.transpose(0, 2, 1)
+    return J
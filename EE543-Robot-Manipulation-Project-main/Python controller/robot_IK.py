@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Numerical inverse kinematics of the 5 rotary joint robot.
+
+The solver is a damped least squares (Levenberg-Marquardt) iteration on the
+pose error, using the analytic geometric Jacobian robot_FK.jacobian built
+from the frames of robot_FK.FK. Joint limits are enforced by clipping every step.
+"""
+
+import numpy as np
+from robot_FK import FK, jacobian
+
+
+# Default joint limits (in radians) [min, max], the +/-90 degree MG996R range
+JOINT_LIMITS = np.array([[-np.pi/2, np.pi/2]] * 5)
+
+def _rotation_error(R_target, R):
+    """
+    Calculate the rotation vector (axis times angle) that turns R into R_target.
+
+    Args:
+        R_target (np.ndarray): The 3x3 goal rotation matrix.
+        R (np.ndarray): The 3x3 current rotation matrix.
+
+    Returns:
+        np.ndarray: A 3 element rotation vector expressed in the base frame.
+    """
+
+    R_err = R_target @ R.T
+    vee = np.array([R_err[2, 1] - R_err[1, 2],
+                    R_err[0, 2] - R_err[2, 0],
+                    R_err[1, 0] - R_err[0, 1]])
+    cos_angle = np.clip((np.trace(R_err) - 1) / 2, -1.0, 1.0)
+    sin_angle = np.linalg.norm(vee) / 2
+
+    if sin_angle < 1e-6:
+        if cos_angle > 0:
+            # small angle, the rotation vector is half the skew part
+            return vee / 2
+        # angle close to pi, R_err = 2 a a^T - I, recover the axis a from its largest element
+        k = np.argmax(np.diag(R_err))
+        a_k = np.sqrt(max((R_err[k, k] + 1) / 2, 0.0))
+        axis = R_err[k] / (2 * a_k)
+        axis[k] = a_k
+        return np.pi * axis / np.linalg.norm(axis)
+
+    angle = np.arctan2(sin_angle, cos_angle)
+    return vee * (angle / (2 * sin_angle))
+
+
+def IK(target_T, seed, joint_limits=JOINT_LIMITS, active=None, tol=1e-6, max_iter=100,
+       damping=1e-2, orientation_weight=1.0):
+    """
+    Calculate the joint angles that place the end effector at a goal pose.
+
+    Args:
+        target_T (np.ndarray): The 4x4 homogeneous transformation matrix of the goal pose.
+        seed (np.ndarray): A 5x1 vector of joint angles the iteration starts
+            from, usually the current robot state.
+        joint_limits (np.ndarray): A 5x2 array of [min, max] joint angles.
+        active (np.ndarray, optional): A 5 element boolean mask of the joints
+            the solver may move, the other joints stay at their seed value.
+        tol (float): Norm of the weighted pose error that counts as converged.
+        max_iter (int): Maximum number of iterations.
+        damping (float): Initial Levenberg-Marquardt damping factor.
+        orientation_weight (float): Weight of the orientation error relative
+            to the position error, 0 solves for position only.
+
+    Returns:
+        np.ndarray: The 5x1 vector of joint angles of the best solution.
+        bool: True when the pose error dropped below tol.
+    """
+
+    target_T = np.asarray(target_T, dtype=float)
+    joint_limits = np.asarray(joint_limits, dtype=float)
+    gamma = np.clip(np.asarray(seed, dtype=float), joint_limits[:, 0], joint_limits[:, 1])
+    weights = np.array([1, 1, 1] + [orientation_weight] * 3, dtype=float)
+
+    def pose_error(gamma):
+        T, T_matrices = FK(gamma)
+        error = np.concatenate((target_T[:3, 3] - T[:3, 3],
+                                _rotation_error(target_T[:3, :3], T[:3, :3])))
+        return error * weights, T_matrices
+
+    error, T_matrices = pose_error(gamma)
+    cost = error @ error
+    lam = damping
+
+    for _ in range(max_iter):
+        if np.sqrt(cost) < tol:
+            return gamma, True
+
+        J = jacobian(gamma, T_matrices) * weights[:, np.newaxis]
+        if active is not None:
+            J[:, ~np.asarray(active, dtype=bool)] = 0
+
+        # damped least squares step, dq = J^T (J J^T + lambda^2 I)^-1 e
+        step = J.T @ np.linalg.solve(J @ J.T + lam**2 * np.eye(6), error)
+        candidate = np.clip(gamma + step, joint_limits[:, 0], joint_limits[:, 1])
+        candidate_error, candidate_frames = pose_error(candidate)
+        candidate_cost = candidate_error @ candidate_error
+
+        if candidate_cost < cost:
+            # accept the step and trust the linear model more
+            gamma, error, T_matrices, cost = candidate, candidate_error, candidate_frames, candidate_cost
+            lam = max(lam / 2, 1e-6)
+        else:
+            # reject the step and damp harder
+            lam *= 4
+            if lam > 1e6:
+                break
+
+    return gamma, bool(np.sqrt(cost) < tol)
+
@@ -1,11 +1,24 @@
 import time
+import json
+import os
 import numpy as np
 import serial
 import sys
+import queue
+import threading
+import collections
+import serial_protocol
+from control_telemetry import ControlTelemetry
+import robot_FK
+from robot_IK import IK
+from trajectory import synchronized_profile
 
 np.set_printoptions(precision=2, suppress=False)
 np.set_printoptions(formatter={'all': lambda x: f'{x:.2f}'})
 
+# per servo calibration, loaded at startup when the file exists
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'servo_calibration.json')
+
 class robot_controller():
     def __init__(self) -> None:
         #define robot parameter
@@ -18,6 +31,7 @@ class robot_controller():
         self.robotState_endeffector_orientation = np.zeros(3)
         self.robotstate_endeffector_pose = np.zeros(3)
         self.robotstate_gripper_close = False
+        self.robotstate_gripper_angle = 0 # degree
 
         #define homing position in joint space
         self.robot_homing_joint_poses = np.zeros(self.joint_num)
@@ -29,21 +43,27 @@ class robot_controller():
         """
 
         #define the DH parameter for the arm link
-        # [a, alpha, d, theta (will be replaced by joint_positions)]
-        self.dh_params = [ # this is for 4 joints setting
-            [0, 0, 0, 0],  # Joint 1
-            [0, 0, 0, 0],  # Joint 2
-            [0, 0, 0, 0],  # Joint 3
-            [0, 0, 0, 0]   # Joint 4
-        ]
+        # the links share the table and the link convention of robot_FK, [a, alpha, d] in radian
+        # with theta replaced by the joint pose, so the pose computed here is the one robot_IK solves for
+        # the chain has one link more than the arm, its last joint is the gripper servo
+        self.dh_params = robot_FK.DH_PARAMS
+        self.link_num = len(self.dh_params)
 
         self.angle_offsets = np.array([0, 0, 0, 0]) # this is for 4 joints setting
 
         # the transformation matrices from first to last link 
-        self.T_matrices = np.empty(self.joint_num) # no value when init
+        # T_links[i] is the transformation of link i alone, T_matrices[i] is the
+        # pose of link i in the world frame (base_frame @ T_links[0] @ ... @ T_links[i])
+        self.T_links = np.tile(np.eye(4), (self.link_num, 1, 1))
+        self.T_matrices = np.tile(np.eye(4), (self.link_num, 1, 1))
+
+        # joint poses (and gripper angle) and base frame the cached matrices were computed for,
+        # NaN forces a full update
+        self.fk_joint_poses = np.full(self.link_num, np.nan)
+        self.fk_base_frame = np.full((4, 4), np.nan)
 
         #define the base frame
-        self.base_frame = np.eye(self.joint_num)
+        self.base_frame = np.eye(4)
 
         """
         ---------------------------------------------------------------
@@ -56,6 +76,15 @@ class robot_controller():
         self.servo_angle_min = -90 #degree
         self.servo_pulse_max = 440 #+90 for mg996R, This is the 'maximum' pulse length count (out of 4096)
         self.servo_pulse_min = 70 #-90 for mg996R, This is the 'minimum' pulse length count (out of 4096)
+        self.pulse_lut_resolution = 0.1 # degree, angle step of the angle to pulse length table
+
+        # per servo calibration, the 4 joints and then the gripper
+        # servo angle = direction * (commanded angle + offset), offsets of the joints are angle_offsets
+        # calibration points map the servo angle to the measured pulse length piecewise linearly,
+        # None uses the linear servo_pulse_min/servo_pulse_max law
+        self.gripper_angle_offset = 0 # degree
+        self.servo_directions = np.ones(self.joint_num + 1)
+        self.servo_calibration_points = [None] * (self.joint_num + 1)
 
         # Here define the operating parameters for sliding gripper
         # Slider gripper is also controlled by an MG996R servo motor
@@ -67,6 +96,26 @@ class robot_controller():
         self.com_port = 'COM3' # change it if needed
         self.com_baudrate = 115200 #bps
         self.com_frequency = 30 #Hz
+        self.com_timeout = 1 # s, longest wait for a byte from the arduino
+        self.com_protocol = serial_protocol.PROTOCOL_V1 # V2 pipelines framed setpoints, see serial_protocol.py
+        self.com_batch_size = serial_protocol.MAX_BATCH # setpoints per protocol 2 frame
+        self.com_retries = 3 # protocol 2 resends of a frame before giving up
+
+        #define the streaming mode parameter
+        self.stream_queue_size = 16 # commands waiting for the sender thread
+        self.stream_thread = None
+        self.stream_error = None # exception that stopped the sender thread
+        self.state_lock = threading.Lock()
+
+        # timing of every control loop tick, see control_telemetry.py
+        self.telemetry = ControlTelemetry()
+
+        # precompute the angle to pulse length table and the reusable command buffers
+        # call build_pulse_lut again after changing the servo parameters
+        if os.path.exists(CALIBRATION_FILE):
+            self.load_calibration(CALIBRATION_FILE)
+        else:
+            self.build_pulse_lut()
         
 
     """
@@ -75,8 +124,18 @@ class robot_controller():
     ---------------------------------------------------------------
     """
 
-    def communication_begin(self):
-        self.ser = serial.Serial(self.com_port, self.com_baudrate)
+    # ser: an already open serial.Serial compatible object to use instead of com_port,
+    # e.g. arduino_emulator.EmulatedSerial when there is no hardware
+    def communication_begin(self, ser=None):
+        # the period of protocol 2 frames is a 16 bit count of microseconds
+        if self.com_protocol == serial_protocol.PROTOCOL_V2 and 1e6 / self.com_frequency > serial_protocol.MAX_PERIOD_US:
+            raise ValueError(f"Protocol 2 needs a com_frequency of at least "
+                             f"{1e6 / serial_protocol.MAX_PERIOD_US:.1f} Hz, got {self.com_frequency} Hz")
+
+        # reads block in the serial driver until data arrives or com_timeout passes
+        if ser is None:
+            ser = serial.Serial(self.com_port, self.com_baudrate, timeout=self.com_timeout)
+        self.ser = ser
         # Reset input/output buffer and wait for initialization
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
@@ -84,16 +143,39 @@ class robot_controller():
 
         # Wait for Arduino to initialize
         while True:
-            if self.ser.read() == b'I':
+            if self.ser.read() == serial_protocol.INIT_UNO:
                 break
 
-        # Send signaling byte
-        self.ser.write(b'S')
+        # Send signaling byte, it also selects the protocol
+        if self.com_protocol == serial_protocol.PROTOCOL_V2:
+            self.ser.write(serial_protocol.SIG_PC_V2)
+            # sequence number of the next frame, the sent frames waiting for an ACK
+            # as (seq, setpoint count, frame) and the number of answers still to come
+            self.v2_seq = 0
+            self.v2_unacked = collections.deque()
+            self.v2_awaiting = 1
+            # answers to frames sent before the last go back, they no longer trigger one,
+            # and the resends since the arduino last accepted a frame
+            self.v2_stale = 0
+            self.v2_retries = 0
+            # the first answer reports the free ring buffer slots, all of them
+            self._v2_read_response()
+            self.v2_capacity = self.v2_free
+        else:
+            self.ser.write(serial_protocol.SIG_PC)
         time.sleep(0.1)
     
     def communication_end(self):
         self.ser.close()
 
+    # wait for the acknowledgement byte the arduino sends when it is ready for the next command
+    # the blocking read sleeps until the byte arrives instead of polling in_waiting
+    def wait_for_acknowledgement(self):
+        ack = self.ser.read(1)
+        if ack == b'':
+            raise TimeoutError(f"No acknowledgement from the arduino within {self.com_timeout} s")
+        return ack == serial_protocol.ACK_UNO
+
     """
     ---------------------------------------------------------------
      Functions below set up the visualization
@@ -107,15 +189,58 @@ class robot_controller():
     ---------------------------------------------------------------
     """
 
-    # input: DH parameters of a specific link, angle in degree, length in mm
-    # output: the transformation matrix of that link
+    # input: DH parameters of a specific link in the robot_FK convention, alpha and a in radian,
+    # d in the length unit of robot_FK.DH_PARAMS, theta in degree
+    # output: the transformation matrix of that link, Hrotx(alpha) @ Hroty(theta) @ Hrotz(a) @ [d along x]
     def dh_to_transformation_matrix(self, alpha, a, d, theta):
-
-        return None
+        return robot_FK.link_transforms(np.deg2rad([theta]), np.array([[a, alpha, d]]))[0]
     
+    # update the link matrices and the end effector pose from robotstate_joint_poses and the gripper angle
+    # only the links from the first joint that moved since the last update are recomputed,
+    # the prefix products of the links before it are reused from T_matrices
+    # a changed base_frame moves every link, so all poses are chained again
     def update_forward_kinematics(self):
-        
-       return None
+        joint_poses = np.append(self.robotstate_joint_poses, self.robotstate_gripper_angle)
+        changed = np.flatnonzero(joint_poses != self.fk_joint_poses)
+        base_changed = not np.array_equal(self.base_frame, self.fk_base_frame)
+        if len(changed) == 0 and not base_changed:
+            return self.T_matrices[-1]
+
+        # only the links of the moved joints change
+        if len(changed):
+            self.T_links[changed] = robot_FK.link_transforms(np.deg2rad(joint_poses[changed]), self.dh_params[changed])
+
+        # every link pose from the first moved joint onwards depends on it
+        first = 0 if base_changed else changed[0]
+        previous = self.base_frame if first == 0 else self.T_matrices[first - 1]
+        for i in range(first, self.link_num):
+            np.matmul(previous, self.T_links[i], out=self.T_matrices[i])
+            previous = self.T_matrices[i]
+        self.fk_joint_poses[:] = joint_poses
+        self.fk_base_frame[:] = self.base_frame
+
+        # end effector position and roll, pitch, yaw (degree) of the last link
+        T = self.T_matrices[-1]
+        self.robotstate_endeffector_pose = T[:3, 3].copy()
+        self.robotState_endeffector_orientation = np.rad2deg([
+            np.arctan2(T[2, 1], T[2, 2]),
+            np.arctan2(-T[2, 0], np.hypot(T[2, 1], T[2, 2])),
+            np.arctan2(T[1, 0], T[0, 0])
+        ])
+        return T
+
+    # input: the 4x4 homogeneous transformation matrix of the goal end effector pose
+    # output: the joint poses (in degree) that reach the goal and whether the solver converged
+    # the current joint poses are the initial guess, so small moves converge in a few iterations
+    # the robot_FK chain has one more joint than the arm, its last joint is the gripper servo,
+    # which is kept at its current angle
+    def joints_inverse_kinematics(self, target_T):
+        seed = np.deg2rad(np.append(self.robotstate_joint_poses, self.robotstate_gripper_angle))
+        joint_limits = np.deg2rad([[self.servo_angle_min, self.servo_angle_max]] * len(seed))
+        active = np.arange(len(seed)) < self.joint_num
+
+        gamma, converged = IK(target_T, seed, joint_limits, active=active)
+        return np.rad2deg(gamma[:self.joint_num]), converged
 
 
 
@@ -132,6 +257,84 @@ class robot_controller():
         pulse_lengths = ((clipped_angles - self.servo_angle_min) * (self.servo_pulse_max - self.servo_pulse_min) / (self.servo_angle_max - self.servo_angle_min) + self.servo_pulse_min).astype(int)
         return pulse_lengths
 
+    # read the per servo offsets, directions and calibration points from a json file
+    # and compile them into the pulse length table, see servo_calibration.json for the format
+    def load_calibration(self, path):
+        with open(path) as f:
+            servos = json.load(f)['servos']
+        if len(servos) != self.joint_num + 1:
+            raise ValueError(f"{path} must list {self.joint_num + 1} servos, the joints and then the gripper")
+
+        offsets = np.zeros(self.joint_num + 1)
+        directions = np.ones(self.joint_num + 1)
+        points = []
+        for i, servo in enumerate(servos):
+            offsets[i] = servo.get('offset', 0)
+            directions[i] = servo.get('direction', 1)
+            if directions[i] not in (1, -1):
+                raise ValueError(f"{path}: direction of servo {i} must be 1 or -1")
+
+            servo_points = servo.get('points')
+            if servo_points is not None:
+                servo_points = np.array(servo_points, dtype=float)
+                if servo_points.ndim != 2 or servo_points.shape[1] != 2 or len(servo_points) < 2:
+                    raise ValueError(f"{path}: points of servo {i} must be at least two [angle, pulse] pairs")
+                if np.any(np.diff(servo_points[:, 0]) <= 0):
+                    raise ValueError(f"{path}: point angles of servo {i} must be increasing")
+            points.append(servo_points)
+
+        self.angle_offsets = offsets[:-1]
+        self.gripper_angle_offset = offsets[-1]
+        self.servo_directions = directions
+        self.servo_calibration_points = points
+        self.build_pulse_lut()
+
+    # tabulate the pulse length of every servo, the joints and then the gripper,
+    # so a command is encoded with a few in-place numpy calls and no allocation
+    # the table index of an angle is round((angle - servo_angle_min) / pulse_lut_resolution)
+    def build_pulse_lut(self):
+        servo_num = self.joint_num + 1
+        lut_size = int(round((self.servo_angle_max - self.servo_angle_min) / self.pulse_lut_resolution)) + 1
+        lut_angles = np.linspace(self.servo_angle_min, self.servo_angle_max, lut_size)
+        offsets = np.append(self.angle_offsets, self.gripper_angle_offset)
+
+        # one row per servo, flattened so np.take indexes all servos at once
+        self.pulse_lut = np.empty((servo_num, lut_size), dtype='>u2')
+        for i in range(servo_num):
+            servo_angles = self.servo_directions[i] * (lut_angles + offsets[i])
+            points = self.servo_calibration_points[i]
+            if points is None:
+                self.pulse_lut[i] = self.angle_to_pulse_length(servo_angles)
+            else:
+                # outside the measured points the pulse length stays at the end values
+                self.pulse_lut[i] = np.interp(servo_angles, points[:, 0], points[:, 1]).astype(int)
+        self.pulse_lut_flat = self.pulse_lut.reshape(-1)
+        self.pulse_lut_row_offsets = np.arange(servo_num) * lut_size
+
+        # the command buffer, its big endian uint16 view holds JP1_H, JP1_L, ... in place
+        self.command_frame = bytearray(2 * servo_num)
+        self.command_frame_pulses = np.frombuffer(self.command_frame, dtype='>u2')
+        self.command_frame_angles = np.empty(servo_num)
+        self.command_frame_index = np.empty(servo_num, dtype=np.intp)
+
+    # convert the joint poses and the gripper angle into the bytes of a command
+    # output: the reused command_frame bytearray, it is overwritten by the next call
+    def encode_frame(self, joint_poses, gripper_angle=None):
+        angles = self.command_frame_angles
+        angles[:-1] = joint_poses
+        angles[-1] = self.robotstate_gripper_angle if gripper_angle is None else gripper_angle
+
+        # angle -> table index of every servo
+        np.clip(angles, self.servo_angle_min, self.servo_angle_max, out=angles)
+        np.subtract(angles, self.servo_angle_min, out=angles)
+        np.multiply(angles, 1 / self.pulse_lut_resolution, out=angles)
+        np.rint(angles, out=angles)
+        np.add(angles, self.pulse_lut_row_offsets, out=self.command_frame_index, casting='unsafe')
+
+        # table lookup straight into the command buffer
+        np.take(self.pulse_lut_flat, self.command_frame_index, out=self.command_frame_pulses)
+        return self.command_frame
+
     # convert the multiple joint poses in pulse lengths into 8 bytes array
     # format will be JP1_H, JP1_L, ..., unit: length count
     def pulse_length_to_byte(self, pulse_lengths):
@@ -153,86 +356,240 @@ class robot_controller():
         # reset robot state
         self.robotstate_joint_poses = self.robot_homing_joint_poses.copy()
         self.robotstate_gripper_close = False
-
-        # compose command
-        joint_pulse_lengthes = self.angle_to_pulse_length(self.robotstate_joint_poses)
-        joint_pulse_lengthes = np.append(joint_pulse_lengthes,self.gripper_pulse_open)
-        # print(joint_pulse_lengthes)
-        numbers = self.pulse_length_to_byte(joint_pulse_lengthes)
+        self.robotstate_gripper_angle = self.gripper_open_angle
+        self.update_forward_kinematics()
+
+        # compose and send command
+        self.send_command(self.robotstate_joint_poses)
+
+    # convert the joint poses and the current gripper angle into the bytes of a command
+    # the returned buffer is reused, copy it to keep the command
+    def compose_command(self, joint_poses):
+        return self.encode_frame(joint_poses)
+
+    # convert a (steps, joint_num) array of joint poses into one command per row
+    # output: (steps, (joint_num+1)*2) uint8 array, the gripper uses its current angle
+    def compose_commands(self, trajectory):
+        angles = np.empty((len(trajectory), self.joint_num + 1))
+        angles[:, :-1] = trajectory
+        angles[:, -1] = self.robotstate_gripper_angle
+
+        # same table lookup as encode_frame, for all rows at once
+        np.clip(angles, self.servo_angle_min, self.servo_angle_max, out=angles)
+        index = np.rint((angles - self.servo_angle_min) / self.pulse_lut_resolution).astype(np.intp)
+        index += self.pulse_lut_row_offsets
+        pulse_lengths = self.pulse_lut_flat[index]
+        # the big endian uint16 values already are the JP_H, JP_L byte pairs
+        return pulse_lengths.view(np.uint8)
+
+    # send the command of the joint poses once the arduino acknowledged the previous one
+    def send_command(self, joint_poses):
+        return self.send_frame(self.compose_command(joint_poses))
+
+    # send the bytes of a composed command once the arduino acknowledged the previous one
+    def send_frame(self, numbers):
         # print(numbers)
-        # Poll for acknowledgement
-        while self.ser.in_waiting == 0:
-            continue
-        # ser.reset_input_buffer()
+        if self.com_protocol == serial_protocol.PROTOCOL_V2:
+            return self.send_setpoints(numbers)
 
-        # # Send data if acknowledgement received
-        if self.ser.read() == b'A':
+        # Wait for acknowledgement, then send data
+        if self.wait_for_acknowledgement():
             self.ser.write(numbers)
             self.ser.flush()
+            return True
+        return False
+
+    """
+    ---------------------------------------------------------------
+     Functions below run protocol 2: the setpoints are sent in
+     frames of com_batch_size without waiting for each ACK, the
+     arduino buffers them and plays one per communication period
+    ---------------------------------------------------------------
+    """
+
+    # queue the composed commands on the arduino, frames is one command or a (steps, 10) array of them
+    # blocks only while the ring buffer of the arduino is full
+    def send_setpoints(self, frames):
+        data = np.ascontiguousarray(frames, dtype=np.uint8).reshape(-1)
+        period_us = int(round(1e6 / self.com_frequency))
+        batch_bytes = self.com_batch_size * serial_protocol.SETPOINT_SIZE
+
+        for start in range(0, len(data), batch_bytes):
+            setpoints = data[start:start + batch_bytes]
+            count = len(setpoints) // serial_protocol.SETPOINT_SIZE
+            self._v2_wait_for_credit(count)
+
+            frame = serial_protocol.encode_frame_v2(self.v2_seq, period_us, setpoints)
+            self.v2_unacked.append((self.v2_seq, count, frame))
+            self.v2_seq = (self.v2_seq + 1) & 0xFF
+            self.v2_awaiting += 1
+            self.ser.write(frame)
+
+        self.ser.flush()
+        # take the answers that already arrived without waiting for the others,
+        # a broken one can leave it waiting, the missing answers are recovered with the credit
+        try:
+            while self.ser.in_waiting >= serial_protocol.RESPONSE_SIZE:
+                self._v2_read_response()
+        except TimeoutError:
+            pass
+        return True
+
+    # block until the arduino played every queued setpoint
+    def wait_for_playback(self):
+        self._v2_wait_for_credit(self.v2_capacity)
+
+    # ring buffer slots that are free once every frame in flight is queued
+    def _v2_credit(self):
+        return self.v2_free - sum(count for _, count, _ in self.v2_unacked)
+
+    def _v2_wait_for_credit(self, count):
+        while self._v2_credit() < count:
+            if self.v2_awaiting == 0:
+                # the ring buffer is full, give the arduino a period to play a setpoint and ask again
+                time.sleep(1 / self.com_frequency)
+                self.ser.write(serial_protocol.encode_frame_v2(self.v2_seq, 0, b''))
+                self.v2_awaiting += 1
+            try:
+                self._v2_read_response()
+            except TimeoutError:
+                # frames or answers got lost, resend everything that was not acknowledged
+                self.v2_awaiting = 0
+                self.v2_stale = 0
+                self._v2_resend(TimeoutError(f"No answer from the arduino within {self.com_timeout} s "
+                                             f"after {self.com_retries} resends"))
+
+    # go back N: resend every frame that was not acknowledged, in order
+    # raises error once the oldest of them was resent com_retries times without being accepted
+    def _v2_resend(self, error):
+        self.v2_retries += 1
+        if self.v2_retries > self.com_retries:
+            raise error
+        # the answers still to come belong to frames sent before the go back
+        self.v2_stale = self.v2_awaiting
+        for _, _, frame in self.v2_unacked:
+            self.ser.write(frame)
+            self.v2_awaiting += 1
+
+    def _v2_read_response(self):
+        response = self.ser.read(serial_protocol.RESPONSE_SIZE)
+        skipped = 0
+        while True:
+            if len(response) < serial_protocol.RESPONSE_SIZE:
+                raise TimeoutError(f"No answer from the arduino within {self.com_timeout} s")
+            decoded = serial_protocol.decode_response(response)
+            if decoded is not None:
+                break
+            # a corrupted or partial answer, look for the next one a byte further
+            response = response[1:] + self.ser.read(1)
+            skipped += 1
+
+        # the answers the skipped bytes belonged to are lost, then comes this one
+        answers = 1 - (-skipped // serial_protocol.RESPONSE_SIZE)
+        stale = self.v2_stale >= answers
+        self.v2_awaiting = max(self.v2_awaiting - answers, 0)
+        self.v2_stale = max(self.v2_stale - answers, 0)
+
+        acknowledged, seq, free = decoded
+        self.v2_free = free
+        # both answers are cumulative, an ACK carries the last accepted seq, a NAK the expected one
+        expected = (seq + 1) & 0xFF if acknowledged else seq
+        while self.v2_unacked and (expected - self.v2_unacked[0][0] - 1) & 0xFF < 128:
+            self.v2_unacked.popleft()
+            self.v2_retries = 0
+        if not self.v2_unacked or stale or self.v2_unacked[0][0] != expected:
+            return
+
+        # the arduino still waits for the oldest unacknowledged frame: it was lost or corrupted
+        # when it answers with a NAK, or when nothing else is in flight that could still bring it
+        # a frame that does not fit the ring buffer waits for credit instead
+        if (not acknowledged or self.v2_awaiting == 0) and self.v2_unacked[0][1] <= free:
+            self._v2_resend(IOError(f"The arduino did not accept frame {expected} "
+                                    f"after {self.com_retries} resends"))
 
 
     
-    # this is the goto function in joint space
-    # input is the array of joint poses(in degree) and the arry of joint velocities(degree/s)  
-    def joints_goto(self, goals, speeds):
-        # get the current robot joint poses
-        start_poses = self.robotstate_joint_poses.copy()
-        # print("Start Poses: ", start_poses)
+    # calculate the joint poses of a goto move, one row per communication period
+    # without accelerations every joint moves at its own constant speed and stops at its goal,
+    # with accelerations(degree/s^2) the speeds become limits of a synchronized trapezoid or
+    # s-curve profile in which all joints arrive together (see trajectory.py)
+    # output: (steps, joint_num) array, the last row is within joints_goto_tolerance of the goals
+    def joints_goto_trajectory(self, start_poses, goals, speeds, accelerations=None, profile='trapezoid'):
+        if accelerations is not None:
+            return synchronized_profile(start_poses, goals, speeds, accelerations, self.com_frequency, profile)
+
+        start_poses = np.asarray(start_poses, dtype=float)
+        goals = np.asarray(goals, dtype=float)
+
         # calculate the rotation direction of each joints
         angle_diff = goals - start_poses
-        # print("angle difference: ", angle_diff)
-        # calculate the angle increments under 20Hz update rates
-        angle_increments = np.sign(angle_diff) * (speeds / self.com_frequency)
-        
+        # calculate the angle increments under the communication frequency
+        angle_increments = np.sign(angle_diff) * (np.asarray(speeds, dtype=float) / self.com_frequency)
+
+        # number of periods until every joint is within tolerance of its goal
+        remaining = np.abs(angle_diff) - self.joints_goto_tolerance
+        moving = remaining > 0
+        if np.any(moving & (angle_increments == 0)):
+            raise ValueError("Every joint that has to move needs a non-zero speed")
+        steps = int(np.max(np.ceil(remaining[moving] / np.abs(angle_increments[moving])), initial=0))
+        steps = max(steps, 1)
+
+        # add the increments of every period at once and stop each joint at its goal
+        periods = np.arange(1, steps + 1)[:, np.newaxis]
+        trajectory = np.clip(start_poses + periods * angle_increments,
+                             np.minimum(start_poses, goals), np.maximum(start_poses, goals))
+
+        # guard against rounding in the step count
+        if np.any(np.abs(trajectory[-1] - goals) > self.joints_goto_tolerance):
+            trajectory = np.vstack((trajectory, goals))
 
-        reached_goal = False        
-        # update the robot joint poses by adding the angle increments
-        while not reached_goal:
-            start = time.time()
-            # print("Start Poses: ", start_poses)
-            # print("angle difference: ", angle_diff)
-
-            # Generate 8 uint8_t numbers
-            self.robotstate_joint_poses += angle_increments
-            # check if the individual joint reach the goal
-            for i in range(self.joint_num):
-                if goals[i] > start_poses[i]: # the angle is increasing
-                    self.robotstate_joint_poses[i] = np.clip(self.robotstate_joint_poses[i], start_poses[i], goals[i])
-                elif goals[i] < start_poses[i]: # the angle is decreasing
-                    self.robotstate_joint_poses[i] = np.clip(self.robotstate_joint_poses[i], goals[i], start_poses[i])
-                else:
-                    self.robotstate_joint_poses[i] = start_poses[i].copy()
+        return trajectory
+
+    # this is the goto function in joint space
+    # input is the array of joint poses(in degree) and the arry of joint velocities(degree/s)  
+    # optional joint accelerations(degree/s^2) switch to a synchronized profile
+    def joints_goto(self, goals, speeds, accelerations=None, profile='trapezoid'):
+        # precompute the joint poses of every period and the matching commands,
+        # the loop below only indexes into them
+        trajectory = self.joints_goto_trajectory(self.robotstate_joint_poses, goals, speeds, accelerations, profile)
+        frames = self.compose_commands(trajectory)
+
+        period_ns = int(1e9 / self.com_frequency)
+
+        if self.com_protocol == serial_protocol.PROTOCOL_V2:
+            # the arduino paces the playback, send batches while its ring buffer has room
+            # the robot state is the last queued setpoint, ahead of the servos by at most the buffer
+            for start in range(0, len(trajectory), self.com_batch_size):
+                tick_start = time.perf_counter_ns()
+                count = len(frames[start:start + self.com_batch_size])
+                self.send_setpoints(frames[start:start + count])
+                sent = time.perf_counter_ns()
+                with self.state_lock:
+                    self.robotstate_joint_poses = trajectory[start + count - 1].copy()
+                    self.update_forward_kinematics()
+                self.telemetry.record(tick_start, time.perf_counter_ns() - sent, sent - tick_start,
+                                      count * period_ns, count, first=start == 0)
+            self.wait_for_playback()
+            return
+
+        for tick, (joint_poses, frame) in enumerate(zip(trajectory, frames)):
+            start = time.perf_counter_ns()
+
+            with self.state_lock:
+                self.robotstate_joint_poses = joint_poses.copy()
+                self.update_forward_kinematics()
             # print("Robotstate: ",self.robotstate_joint_poses)
             # Set the desired print options
             sys.stdout.write('\r' + ' ' * 50 + '\r') # clear the line
             sys.stdout.write("\r" + "Robotstate: " + str(self.robotstate_joint_poses))
             sys.stdout.flush()    
-            
-            #check if the robot reach the goal joint poses
-            if np.all(np.abs(self.robotstate_joint_poses - goals) <= self.joints_goto_tolerance):
-                reached_goal = True
+            computed = time.perf_counter_ns()
 
-            #convert the joint_pose to pulse length
-            joint_pulse_lengthes = self.angle_to_pulse_length(self.robotstate_joint_poses)
-
-            #add one more byte in the pulse length array to as gripper command
-            if self.robotstate_gripper_close:
-                joint_pulse_lengthes = np.append(joint_pulse_lengthes,self.gripper_pulse_close)
-            else:
-                joint_pulse_lengthes = np.append(joint_pulse_lengthes,self.gripper_pulse_open)
-            # print(joint_pulse_lengthes)
-            numbers = self.pulse_length_to_byte(joint_pulse_lengthes)
-            # print(numbers)   
-
-            # Poll for acknowledgement
-            while self.ser.in_waiting == 0:
-                continue
-
-            # Send data if acknowledgement received
-            if self.ser.read() == b'A':
-                self.ser.write(numbers)
-                self.ser.flush()
-                dur = time.time() - start
+            # Send data once acknowledgement received
+            if self.send_frame(frame):
+                sent = time.perf_counter_ns()
+                self.telemetry.record(start, computed - start, sent - computed, period_ns, first=tick == 0)
+                dur = (sent - start) / 1e9
                 time.sleep(np.clip((1/self.com_frequency)-dur-0.005, 0, (1/self.com_frequency)))#50Hz
 
         # The function below control the end effector using the servo motor position
@@ -242,29 +599,14 @@ class robot_controller():
         # Clip the angle within operating range
         angle = np.clip(angle, self.gripper_close_angle, self.gripper_open_angle)
 
-        # Convert angle to pulse length
-        pulse_length = self.angle_to_pulse_length(angle)
-        
         # Store gripper angle
-        self.robotstate_gripper_angle = angle
+        with self.state_lock:
+            self.robotstate_gripper_angle = angle
+            self.robotstate_gripper_close = angle == self.gripper_close_angle
+            self.update_forward_kinematics()
 
-        # Send the pulse length command to the gripper
-        joint_pulse_lengthes = self.angle_to_pulse_length(self.robotstate_joint_poses)
-
-        # Add gripper angle to the pulse length array
-        joint_pulse_lengthes = np.append(joint_pulse_lengthes, pulse_length)
-
-        # Convert to bytes and send
-        numbers = self.pulse_length_to_byte(joint_pulse_lengthes)
-        
-        # Poll for acknowledgment
-        while self.ser.in_waiting == 0:
-            continue
-
-        # Send data if acknowledgment received
-        if self.ser.read() == b'A':
-            self.ser.write(numbers)
-            self.ser.flush()
+        # Send the gripper angle together with the current joint poses
+        self.send_command(self.robotstate_joint_poses)
 
     # The function below control the end effector using the percentage
     # 0% means the gripper is fully opened
@@ -275,4 +617,215 @@ class robot_controller():
         # convert the percentage into angle
         angle = percentage * (self.gripper_close_angle - self.gripper_open_angle) / 100
 
-        self.gripper_set_angle(angle)
\ No newline at end of file
+        self.gripper_set_angle(angle)
+
+    """
+    ---------------------------------------------------------------
+     Functions below run the streaming mode: a sender thread owns the
+     serial port and emits one setpoint per communication period,
+     the callers only queue commands and return immediately
+    ---------------------------------------------------------------
+    """
+
+    # start the sender thread, call it after communication_begin
+    def stream_begin(self):
+        self.stream_queue = queue.Queue(maxsize=self.stream_queue_size)
+        # number of queued or running commands and number of preemptions, guarded by stream_done
+        self.stream_pending = 0
+        self.stream_generation = 0
+        self.stream_done = threading.Condition()
+        self.stream_error = None
+        self.stream_running = True
+        self.stream_thread = threading.Thread(target=self._stream_loop, daemon=True)
+        self.stream_thread.start()
+
+    # stop the sender thread, pending commands are dropped
+    # raises the error that stopped the sender thread, also one of confirming the frames already sent
+    def stream_end(self):
+        if self.stream_thread is None:
+            return
+        self.stream_running = False
+        with self.stream_done:
+            self._stream_drain()
+            self.stream_generation += 1
+            item = (self.stream_generation, None)
+        self.stream_queue.put(item)
+        self.stream_thread.join()
+        self.stream_thread = None
+        with self.stream_done:
+            self._stream_raise()
+
+    # queue a goto move in joint space, same inputs as joints_goto
+    # preempt=True drops the pending commands and retargets the current move from where the robot is
+    def stream_goto(self, goals, speeds, accelerations=None, profile='trapezoid', preempt=True):
+        self._stream_put(('goto', np.array(goals, dtype=float), np.array(speeds, dtype=float),
+                          accelerations, profile), preempt)
+
+    # queue an (steps, joint_num) array of joint poses, one is sent per communication period
+    def stream_trajectory(self, setpoints, preempt=True):
+        self._stream_put(('trajectory', np.array(setpoints, dtype=float)), preempt)
+
+    # set the gripper without interrupting the current move, every streamed frame carries the gripper angle
+    def stream_gripper_set_percentage(self, percentage):
+        percentage = np.clip(percentage, 0, 100)
+        angle = percentage * (self.gripper_close_angle - self.gripper_open_angle) / 100
+        with self.state_lock:
+            self.robotstate_gripper_angle = np.clip(angle, self.gripper_close_angle, self.gripper_open_angle)
+            self.robotstate_gripper_close = self.robotstate_gripper_angle == self.gripper_close_angle
+            self.update_forward_kinematics()
+        # make sure an idle sender emits a frame with the new angle, never blocks:
+        # with a full queue the sender is busy and every frame it sends carries the angle
+        self._stream_put(('hold',), preempt=False, block=False)
+
+    # block until every queued command was sent, returns False on timeout
+    # with protocol 2 sent means the arduino acknowledged and played the frames
+    # raises the error that stopped the sender thread
+    def stream_wait(self, timeout=None):
+        with self.stream_done:
+            done = self.stream_done.wait_for(lambda: self.stream_pending == 0, timeout)
+            self._stream_raise()
+            return done
+
+    # consistent snapshot of the robot state while the sender thread updates it
+    # 'error' is the exception that stopped the sender thread, a stopped sender is never moving
+    def get_state(self):
+        with self.state_lock:
+            return {
+                'joint_poses': self.robotstate_joint_poses.copy(),
+                'gripper_angle': float(self.robotstate_gripper_angle),
+                'endeffector_pose': np.array(self.robotstate_endeffector_pose),
+                'endeffector_orientation': np.array(self.robotState_endeffector_orientation),
+                'moving': self.stream_thread is not None and self.stream_error is None and self.stream_pending > 0,
+                'error': self.stream_error,
+            }
+
+    # block=False drops the command instead of waiting while the queue is full, returns whether it was queued
+    def _stream_put(self, command, preempt, block=True):
+        with self.stream_done:
+            self._stream_raise()
+            if preempt:
+                # drop everything that has not started yet, the move that is running
+                # belongs to an older generation and gets cut by the sender thread
+                self._stream_drain()
+                self.stream_generation += 1
+            if command is not None:
+                self.stream_pending += 1
+            item = (self.stream_generation, command)
+            self.stream_done.notify_all()
+        if not block:
+            try:
+                self.stream_queue.put_nowait(item)
+                return True
+            except queue.Full:
+                # nothing was queued, an error of the sender already cleared the pending count
+                with self.stream_done:
+                    if self.stream_error is None:
+                        self.stream_pending -= 1
+                    self.stream_done.notify_all()
+                return False
+        # blocks while the queue is full, but not on a sender that stopped on an error
+        while True:
+            try:
+                self.stream_queue.put(item, timeout=self.com_timeout)
+                return True
+            except queue.Full:
+                with self.stream_done:
+                    self._stream_raise()
+
+    def _stream_drain(self):
+        # drop the queued commands, called with stream_done held
+        while True:
+            try:
+                if self.stream_queue.get_nowait()[1] is not None:
+                    self.stream_pending -= 1
+            except queue.Empty:
+                break
+
+    def _stream_raise(self):
+        # hand the error of the sender thread to the caller, called with stream_done held
+        if self.stream_error is not None:
+            raise self.stream_error
+
+    def _stream_failed(self, error):
+        # the sender thread stops, nothing queued will be sent anymore
+        with self.stream_done:
+            self.stream_error = error
+            self.stream_running = False
+            self._stream_drain()
+            self.stream_pending = 0
+            self.stream_done.notify_all()
+
+    def _stream_finished(self):
+        # the current command was sent completely or cut by a preemption
+        with self.stream_done:
+            self.stream_pending -= 1
+            self.stream_done.notify_all()
+
+    def _stream_next_setpoints(self, command):
+        kind = command[0]
+        if kind == 'goto':
+            _, goals, speeds, accelerations, profile = command
+            return iter(self.joints_goto_trajectory(self.robotstate_joint_poses, goals, speeds,
+                                                    accelerations, profile))
+        if kind == 'trajectory':
+            return iter(command[1])
+        # 'hold' resends the current joint poses once
+        return iter([self.robotstate_joint_poses.copy()])
+
+    def _stream_loop(self):
+        period = 1 / self.com_frequency
+        period_ns = int(1e9 / self.com_frequency)
+        setpoints = None
+        generation = 0
+        next_tick = time.perf_counter()
+        # the next tick follows an idle wait, it starts a new move for the telemetry
+        resumed = True
+
+        # an error (e.g. a serial timeout) stops the stream, the callers get it from
+        # stream_wait, stream_goto and get_state instead of waiting on a dead thread
+        try:
+            while self.stream_running:
+                # a superseding command cuts the current move
+                if setpoints is not None and generation != self.stream_generation:
+                    setpoints = None
+                    self._stream_finished()
+
+                # take the next command, wait for one when there is nothing to send
+                if setpoints is None:
+                    generation, command = self.stream_queue.get()
+                    if command is None:
+                        break
+                    setpoints = self._stream_next_setpoints(command)
+                    now = time.perf_counter()
+                    resumed = resumed or next_tick < now
+                    next_tick = max(next_tick, now)
+
+                tick_start = time.perf_counter_ns()
+                joint_poses = next(setpoints, None)
+                if joint_poses is None:
+                    # protocol 2 only blocks without credit, confirm the frames in flight before
+                    # the last command counts as sent, a dead link raises here
+                    if self.com_protocol == serial_protocol.PROTOCOL_V2 and self.stream_queue.empty():
+                        self.wait_for_playback()
+                    setpoints = None
+                    self._stream_finished()
+                    continue
+
+                with self.state_lock:
+                    self.robotstate_joint_poses = np.array(joint_poses, dtype=float)
+                    self.update_forward_kinematics()
+                computed = time.perf_counter_ns()
+                self.send_command(self.robotstate_joint_poses)
+                sent = time.perf_counter_ns()
+                self.telemetry.record(tick_start, computed - tick_start, sent - computed, period_ns, first=resumed)
+                resumed = False
+
+                # sleep until the next communication period
+                next_tick += period
+                time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+            # the frames of a move cut by stream_end are on their way, confirm them too
+            if self.com_protocol == serial_protocol.PROTOCOL_V2:
+                self.wait_for_playback()
+        except Exception as error:
+            self._stream_failed(error)
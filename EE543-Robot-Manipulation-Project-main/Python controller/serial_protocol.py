@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Constants and frame encoding of the serial protocols spoken by joint_controller.ino.
+
+Protocol 1 (stop-and-wait):
+    PC 'S' after the arduino sent 'I', then for every 'A' from the arduino
+    one 10 byte setpoint: 5 big endian uint16 pulse lengths, the 4 joints
+    and then the gripper.
+
+Protocol 2 (framed, pipelined):
+    PC 'P' after the arduino sent 'I'. The PC then sends frames
+
+        0xAA 0x55 | seq | count | period_us (uint16) | count setpoints | CRC-16
+
+    where the CRC-16/CCITT (poly 0x1021, init 0xFFFF) covers seq up to the
+    last setpoint byte. The arduino queues the setpoints in a ring buffer
+    and plays one every period_us. It answers every frame with 5 bytes
+
+        'K' | last accepted seq | free ring slots | CRC-16    (cumulative ACK)
+        'N' | expected seq      | free ring slots | CRC-16    (CRC error, gap or overflow)
+
+    where the CRC covers the first 3 bytes. The PC drops an answer that fails
+    it and looks for the next one a byte further, a corrupted answer counts
+    as a lost one. A frame with count 0 is a status poll, it is answered but not queued.
+    The PC keeps sending while the ring has free slots and only goes back to
+    the oldest unacknowledged frame and resends it and every later one after
+    a NAK for it, or when no answer arrives in time, so the link is never
+    idle waiting for a round trip. v1 setpoints start with a pulse high byte of 0 or 1,
+    so the 0xAA header can never be mistaken for one.
+"""
+
+import binascii
+import struct
+
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+
+# handshake and acknowledgement bytes
+INIT_UNO = b'I'
+SIG_PC = b'S'
+ACK_UNO = b'A'
+SIG_PC_V2 = b'P'
+ACK_V2 = b'K'
+NAK_V2 = b'N'
+
+HEADER = b'\xaa\x55'
+SETPOINT_SIZE = 10 # bytes, 4 joints and the gripper
+MAX_BATCH = 4 # setpoints per frame, keeps a frame below the 64 byte arduino RX buffer
+RESPONSE_SIZE = 5
+MAX_PERIOD_US = 0xFFFF # the uint16 period field, protocol 2 plays at least 1e6 / MAX_PERIOD_US (15.3) Hz
+
+_FRAME_HEAD = struct.Struct('>2sBBH')
+
+
+def crc16_ccitt(data, crc=0xFFFF):
+    """
+    Calculate the CRC-16/CCITT (poly 0x1021, init 0xFFFF) of data.
+
+    Returns:
+        int: The 16 bit checksum.
+    """
+
+    # binascii.crc_hqx is this exact CRC implemented in C
+    return binascii.crc_hqx(data, crc)
+
+
+def encode_frame_v2(seq, period_us, setpoints):
+    """
+    Wrap setpoints into a protocol 2 frame.
+
+    Args:
+        seq (int): Sequence number of the frame, modulo 256.
+        period_us (int): Playback period of the setpoints in microseconds.
+        setpoints (bytes-like): count * SETPOINT_SIZE bytes of setpoints,
+            empty for a status poll.
+
+    Returns:
+        bytes: The frame, header and CRC included.
+
+    Raises:
+        ValueError: For partial or too many setpoints, or a period that does
+            not fit 16 bits, below 1e6 / MAX_PERIOD_US Hz.
+    """
+
+    count, rest = divmod(len(setpoints), SETPOINT_SIZE)
+    if rest or count > MAX_BATCH:
+        raise ValueError(f"A frame carries whole setpoints, at most {MAX_BATCH}")
+    if not 0 <= period_us <= MAX_PERIOD_US:
+        raise ValueError(f"The playback period {period_us} us does not fit the 16 bit period field")
+
+    frame = bytearray(_FRAME_HEAD.size + len(setpoints) + 2)
+    _FRAME_HEAD.pack_into(frame, 0, HEADER, seq & 0xFF, count, period_us)
+    frame[_FRAME_HEAD.size:-2] = memoryview(setpoints)
+    crc = crc16_ccitt(memoryview(frame)[len(HEADER):-2])
+    frame[-2] = crc >> 8
+    frame[-1] = crc & 0xFF
+    return bytes(frame)
+
+
+def encode_response(kind, seq, free):
+    """
+    Build a protocol 2 response, as the arduino sends it.
+
+    Args:
+        kind (bytes): ACK_V2 or NAK_V2.
+        seq (int): Last accepted seq of an ACK, expected seq of a NAK.
+        free (int): Free ring buffer slots.
+
+    Returns:
+        bytes: The RESPONSE_SIZE bytes of the response, CRC included.
+    """
+
+    response = kind + bytes((seq & 0xFF, free))
+    return response + crc16_ccitt(response).to_bytes(2, 'big')
+
+
+def decode_response(response):
+    """
+    Split a protocol 2 response and check its CRC.
+
+    Returns:
+        tuple: (acknowledged, seq, free) where acknowledged is False for a NAK,
+            or None for a response that is malformed or fails its CRC.
+    """
+
+    if (len(response) != RESPONSE_SIZE or response[:1] not in (ACK_V2, NAK_V2)
+            or crc16_ccitt(response[:3]) != int.from_bytes(response[3:], 'big')):
+        return None
+    return response[:1] == ACK_V2, response[1], response[2]
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lazy exports of the AdelmanPy package:
+
+    python -m pytest test_adelmanpy.py
+"""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import AdelmanPy as ap
+from AdelmanPy.rot import rot
+from AdelmanPy.rotq import rotq
+from AdelmanPy.rotx import rotx
+
+
+def test_functions_are_called_through_the_package():
+    T = ap.Hrotx(0.1)
+    assert T.shape == (4, 4)
+    np.testing.assert_allclose(T[:3, :3], rotx(0.1))
+
+    axis = np.array([0.0, 0.0, 1.0])
+    np.testing.assert_allclose(ap.rot(axis, 0.3), rot(axis, 0.3))
+
+    q = np.array([np.cos(0.2), np.sin(0.2), 0.0, 0.0])
+    np.testing.assert_allclose(ap.rotq(q), rotq(q))
+
+
+def test_submodule_imported_by_another_stays_a_function():
+    # Hroty imports the roty submodule, which binds it on the package
+    ap.Hroty(0.1)
+    assert callable(ap.roty)
+    np.testing.assert_allclose(ap.roty(0.1), ap.Hroty(0.1)[:3, :3])
+
+
+def test_quaternion_exports():
+    q = ap.axisangle_to_quat(np.array([0.0, 0.0, 1.0]), 0.5)
+    np.testing.assert_allclose(ap.quat_multiply(q, ap.quat_conjugate(q)), [1, 0, 0, 0], atol=1e-12)
+
+
+def test_import_loads_no_submodule():
+    script = "import sys, AdelmanPy; print(any(m.startswith('AdelmanPy.') for m in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert output.strip() == 'False'
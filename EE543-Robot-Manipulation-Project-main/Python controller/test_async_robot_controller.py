@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AsyncRobotController against the firmware emulator behind a pseudo terminal:
+
+    python -m pytest test_async_robot_controller.py
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+import serial_protocol
+from arduino_emulator import PtyEmulator
+from async_robot_controller import AsyncRobotController, serial_asyncio
+
+pytestmark = pytest.mark.skipif(serial_asyncio is None, reason="needs the pyserial-asyncio package")
+
+SPEEDS = np.full(4, 90.0)
+
+
+def test_concurrent_moves_run_one_after_the_other():
+    async def main():
+        with PtyEmulator() as pty:
+            R = AsyncRobotController()
+            R.com_port = pty.port
+            R.com_frequency = 100
+            await R.communication_begin()
+            first = R.joints_goto(np.array([10.0, 0, 0, 0]), SPEEDS)
+            second = R.joints_goto(np.array([10.0, -10.0, 0, 0]), SPEEDS)
+            await asyncio.gather(first, second)
+            await R.communication_end()
+            return [pulses for _, pulses in pty.emulator.history], R
+
+    played, R = asyncio.run(main())
+    joint_1, joint_2 = np.array(played)[:, 0], np.array(played)[:, 1]
+    # joint 1 reaches its goal before joint 2 starts, interleaved frames would jump back and forth
+    first_move = np.flatnonzero(joint_2 != joint_2[0])[0]
+    assert np.all(np.diff(joint_1) >= 0) and np.all(np.diff(joint_2) <= 0)
+    assert joint_1[first_move - 1] == joint_1[-1]
+    np.testing.assert_allclose(R.robotstate_joint_poses, [10.0, -10.0, 0, 0])
+
+
+def test_streaming_is_not_available():
+    R = AsyncRobotController()
+    with pytest.raises(NotImplementedError):
+        R.stream_begin()
+    with pytest.raises(NotImplementedError):
+        R.stream_goto([0, 0, 0, 0], SPEEDS)
+
+
+def test_protocol_2_is_rejected():
+    R = AsyncRobotController()
+    R.com_protocol = serial_protocol.PROTOCOL_V2
+    with pytest.raises(NotImplementedError):
+        asyncio.run(R.communication_begin())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recovery of protocol 2 from lost and corrupted frames, run against the
+firmware emulator:
+
+    python -m pytest test_protocol_v2.py
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import serial_protocol
+from arduino_emulator import ArduinoEmulator, EmulatedSerial
+from robot_controller import robot_controller
+
+
+GOALS = np.array([45.0, 0, 0, 0])
+SPEEDS = np.full(4, 90.0)
+
+
+class FaultySerial(EmulatedSerial):
+    """
+    EmulatedSerial that drops or corrupts the first transmissions of chosen
+    frames and chosen bytes of the answers.
+
+    drop and corrupt map a frame seq to the number of its transmissions that
+    are lost or arrive with a broken CRC, status polls are never touched.
+    answer_faults maps the offset of a byte the arduino sends (counted from
+    its first byte) to 'drop' or 'corrupt'.
+    """
+
+    def __init__(self, emulator, drop=None, corrupt=None, answer_faults=None, **kwargs):
+        self.drop = dict(drop or {})
+        self.corrupt = dict(corrupt or {})
+        self.answer_faults = dict(answer_faults or {})
+        self.received = 0
+        super().__init__(emulator, **kwargs)
+
+    def _advance(self, now):
+        start = len(self._rx)
+        super()._advance(now)
+        arrived = self._rx[start:]
+        kept = bytearray()
+        for offset, byte in enumerate(arrived, self.received):
+            fault = self.answer_faults.get(offset)
+            if fault != 'drop':
+                kept.append(byte ^ 0xFF if fault == 'corrupt' else byte)
+        self.received += len(arrived)
+        self._rx[start:] = kept
+
+    def write(self, data):
+        data = bytearray(data)
+        if data[:2] == serial_protocol.HEADER and data[3] > 0:
+            seq = data[2]
+            if self.drop.get(seq, 0) > 0:
+                self.drop[seq] -= 1
+                return len(data)
+            if self.corrupt.get(seq, 0) > 0:
+                self.corrupt[seq] -= 1
+                data[-1] ^= 0xFF
+        return super().write(bytes(data))
+
+
+def connect(drop=None, corrupt=None, answer_faults=None, timeout=0.2):
+    """
+    Connect a controller to the emulator over a faulty link with protocol 2.
+
+    Returns:
+        tuple: The controller and the emulator.
+    """
+
+    emulator = ArduinoEmulator(boot_time=0.0)
+    RC = robot_controller()
+    RC.com_protocol = serial_protocol.PROTOCOL_V2
+    RC.com_frequency = 100
+    RC.com_timeout = timeout
+    RC.communication_begin(ser=FaultySerial(emulator, drop=drop, corrupt=corrupt,
+                                           answer_faults=answer_faults, timeout=RC.com_timeout))
+    return RC, emulator
+
+
+def run_goto(**faults):
+    """
+    Play a 50 setpoint move over a faulty link, see connect for the faults.
+
+    Returns:
+        tuple: The setpoints the emulator played, the setpoints that were
+            sent and the exception joints_goto raised, if any.
+    """
+
+    RC, emulator = connect(**faults)
+
+    expected = RC.compose_commands(RC.joints_goto_trajectory(RC.robotstate_joint_poses, GOALS, SPEEDS))
+    expected = [tuple(int(p) for p in row) for row in expected.view('>u2')]
+
+    # a hang must fail the test instead of blocking it
+    errors = []
+    def goto():
+        try:
+            RC.joints_goto(GOALS, SPEEDS)
+        except Exception as error:
+            errors.append(error)
+    thread = threading.Thread(target=goto, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "joints_goto hung"
+
+    played = [pulses for _, pulses in emulator.history]
+    return played, expected, errors[0] if errors else None
+
+
+@pytest.mark.parametrize('faults', [
+    {},
+    {'drop': {3: 1}},
+    {'drop': {12: 1}}, # the last frame, recovered by the timeout
+    {'drop': {5: 1, 6: 1}},
+    {'corrupt': {3: 1}},
+    {'corrupt': {3: 1, 4: 1}},
+    {'corrupt': {3: 2}}, # the frame and its resend
+    {'corrupt': {3: 3}},
+    {'drop': {3: 1}, 'corrupt': {3: 1}},
+    {'answer_faults': {17: 'corrupt'}}, # the seq of an ACK
+    {'answer_faults': {20: 'corrupt', 21: 'corrupt', 22: 'corrupt'}},
+    {'answer_faults': {31: 'drop'}}, # out of step until the next answer
+    {'answer_faults': {61: 'drop'}, 'corrupt': {4: 1}},
+])
+def test_recovers_every_setpoint_in_order(faults):
+    played, expected, error = run_goto(**faults)
+    assert error is None
+    assert played == expected
+
+
+def test_gives_up_on_a_frame_that_is_always_corrupted():
+    played, expected, error = run_goto(corrupt={3: 100})
+    assert isinstance(error, IOError) and not isinstance(error, TimeoutError)
+    assert played == expected[:len(played)]
+
+
+def test_gives_up_when_the_arduino_never_answers():
+    # the last frame, no later frame gets a NAK that would reveal the loss
+    played, expected, error = run_goto(drop={12: 100})
+    assert isinstance(error, TimeoutError)
+    assert played == expected[:len(played)]
+
+
+def test_decode_response_rejects_a_corrupted_answer():
+    response = serial_protocol.encode_response(serial_protocol.ACK_V2, 7, 12)
+    assert serial_protocol.decode_response(response) == (True, 7, 12)
+    for i in range(serial_protocol.RESPONSE_SIZE):
+        corrupted = bytearray(response)
+        corrupted[i] ^= 0x10
+        assert serial_protocol.decode_response(bytes(corrupted)) is None
+
+
+def test_stream_wait_confirms_a_short_move():
+    RC, emulator = connect()
+    RC.stream_begin()
+    # fewer setpoints than the ring buffer holds, the sender never runs out of credit
+    RC.stream_goto([5.0, 0, 0, 0], SPEEDS)
+    assert RC.stream_wait(5)
+    RC.stream_end()
+    assert len(emulator.history) == len(RC.joints_goto_trajectory(np.zeros(4), [5.0, 0, 0, 0], SPEEDS))
+
+
+def test_stream_wait_raises_on_a_dead_link():
+    RC, emulator = connect(drop={seq: 100 for seq in range(256)})
+    RC.stream_begin()
+    RC.stream_goto([5.0, 0, 0, 0], SPEEDS)
+    with pytest.raises(TimeoutError):
+        RC.stream_wait(10)
+    state = RC.get_state()
+    assert isinstance(state['error'], TimeoutError) and not state['moving']
+    with pytest.raises(TimeoutError):
+        RC.stream_end()
+    assert len(emulator.history) == 0
+
+
+def test_stream_end_confirms_the_frames_already_sent():
+    RC, emulator = connect(drop={seq: 100 for seq in range(256)})
+    RC.stream_begin()
+    RC.stream_goto(GOALS, SPEEDS)
+    # cut the move once a few frames are on their way
+    time.sleep(0.1)
+    with pytest.raises(TimeoutError):
+        RC.stream_end()
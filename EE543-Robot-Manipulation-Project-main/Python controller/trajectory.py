@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synchronized, time-optimal joint space trajectories.
+
+Every joint follows a velocity and acceleration limited profile and all
+joints arrive at the same time: the duration is the minimum time of the
+slowest joint, and each other joint lowers its cruise velocity so that it
+finishes exactly then. The trajectory is sampled at the communication
+frequency of robot_controller, one row of setpoints per period.
+
+Two profile shapes are available:
+    'trapezoid': constant acceleration ramps, the time-optimal profile
+    's-curve':   sine squared acceleration ramps, the acceleration (and so
+                 the servo torque) rises smoothly from zero, it takes
+                 longer for the same peak acceleration
+"""
+
+import numpy as np
+
+
+PROFILES = ('trapezoid', 's-curve')
+
+
+def _ramp_acceleration(max_accelerations, profile):
+    """
+    Average acceleration of a ramp whose peak is max_accelerations.
+
+    A sine squared ramp only averages half its peak acceleration, which
+    makes the s-curve timing equal to a trapezoid with half the acceleration.
+    """
+
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile '{profile}', use one of {PROFILES}")
+    return max_accelerations if profile == 'trapezoid' else max_accelerations / 2
+
+
+def minimum_duration(distances, max_velocities, max_accelerations, profile='trapezoid'):
+    """
+    Calculate the shortest time each joint needs for its move.
+
+    Args:
+        distances (np.ndarray): Absolute angle each joint has to travel.
+        max_velocities (np.ndarray): Velocity limit of each joint.
+        max_accelerations (np.ndarray): Acceleration limit of each joint.
+        profile (str): 'trapezoid' or 's-curve'.
+
+    Returns:
+        np.ndarray: The minimum move time of every joint.
+    """
+
+    distances = np.abs(np.asarray(distances, dtype=float))
+    v = np.broadcast_to(np.asarray(max_velocities, dtype=float), distances.shape)
+    a = _ramp_acceleration(np.broadcast_to(np.asarray(max_accelerations, dtype=float), distances.shape), profile)
+
+    # the joint reaches its velocity limit when it has room to accelerate and brake
+    cruising = distances >= v**2 / a
+    return np.where(cruising, distances / v + v / a, 2 * np.sqrt(distances / a))
+
+
+def synchronized_profile(start_poses, goals, max_velocities, max_accelerations, frequency,
+                         profile='trapezoid'):
+    """
+    Calculate a trajectory in which all joints start and arrive together.
+
+    Args:
+        start_poses (np.ndarray): Joint poses at the start of the move.
+        goals (np.ndarray): Joint poses at the end of the move.
+        max_velocities (np.ndarray): Velocity limit of each joint (unit/s).
+        max_accelerations (np.ndarray): Acceleration limit of each joint (unit/s^2).
+        frequency (float): Sample rate of the setpoints (Hz).
+        profile (str): 'trapezoid' or 's-curve'.
+
+    Returns:
+        np.ndarray: A (steps, joint_num) array of setpoints, one per period
+            after the start, the last row equals goals.
+    """
+
+    start_poses = np.asarray(start_poses, dtype=float)
+    goals = np.asarray(goals, dtype=float)
+    max_velocities = np.broadcast_to(np.asarray(max_velocities, dtype=float), goals.shape)
+    max_accelerations = np.broadcast_to(np.asarray(max_accelerations, dtype=float), goals.shape)
+    if np.any(max_velocities <= 0) or np.any(max_accelerations <= 0):
+        raise ValueError("Velocity and acceleration limits must be positive")
+
+    diff = goals - start_poses
+    distances = np.abs(diff)
+
+    # the slowest joint sets the duration, rounded up to whole periods
+    duration = np.max(minimum_duration(distances, max_velocities, max_accelerations, profile), initial=0)
+    steps = max(int(np.ceil(duration * frequency - 1e-9)), 1)
+    duration = steps / frequency
+
+    # cruise velocity that makes each joint finish exactly at the common duration,
+    # the smaller root of v^2 - a*T*v + a*D = 0
+    a = _ramp_acceleration(max_accelerations, profile)
+    discriminant = np.maximum((a * duration)**2 - 4 * a * distances, 0)
+    v = (a * duration - np.sqrt(discriminant)) / 2
+    ramp_time = v / a
+
+    # the profile is symmetric, the second half mirrors the first one
+    t = np.arange(1, steps + 1)[:, np.newaxis] / frequency
+    traveled = np.where(t < duration / 2,
+                        _ramp_distance(t, v, ramp_time, profile),
+                        distances - _ramp_distance(duration - t, v, ramp_time, profile))
+
+    trajectory = start_poses + np.sign(diff) * np.clip(traveled, 0, distances)
+    trajectory[-1] = goals
+    return trajectory
+
+
+def _ramp_distance(t, v, ramp_time, profile):
+    """
+    Distance covered t seconds into the acceleration ramp up to velocity v.
+
+    Past the end of the ramp the joint continues at v.
+    """
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tr = np.minimum(t, ramp_time)
+        if profile == 'trapezoid':
+            ramp = 0.5 * (v / ramp_time) * tr**2
+        else:
+            # a(t) = a_peak sin^2(pi t / ramp_time) with a_peak = 2 v / ramp_time
+            a_peak = 2 * v / ramp_time
+            ramp = a_peak * (tr**2 / 4 + ramp_time**2 / (8 * np.pi**2) * (np.cos(2 * np.pi * tr / ramp_time) - 1))
+        ramp = np.where(ramp_time > 0, ramp, 0)
+    return ramp + v * np.maximum(t - ramp_time, 0)
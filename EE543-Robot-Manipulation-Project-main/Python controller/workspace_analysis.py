@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Workspace analysis of the 5 rotary joint robot.
+
+Joint space is sampled on a regular grid or at random, in chunks, and every
+chunk is evaluated with FK_batch. The end-effector positions are streamed
+into a preallocated array or a memory-mapped .npy file, so the sweep never
+holds more than one chunk of intermediate results in memory. Large sweeps
+can be split across a process pool, the workers write their results
+straight into shared memory (or the memory-mapped file).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import robot_FK
+from robot_FK import FK_batch
+
+
+# Default range of joint angles (in radians) [min, max]
+JOINT_RANGES = np.array([
+    [0, 2*np.pi],  # Joint 1
+    [-np.pi/2, np.pi/2],  # Joint 2
+    [-np.pi/2, np.pi/2],  # Joint 3
+    [-np.pi/2, np.pi/2],  # Joint 4
+    [-np.pi/2, np.pi/2]   # Joint 5 (Gripper)
+])
+
+# Number of joint configurations evaluated by FK_batch at once
+CHUNK_SIZE = 32768
+
+
+def joint_grid_axes(joint_ranges=JOINT_RANGES, steps=10):
+    """
+    Build the sample values of every joint for a regular joint space grid.
+
+    Args:
+        joint_ranges (np.ndarray): A 5x2 array of [min, max] joint angles.
+        steps (int or sequence): Number of samples per joint, either one value
+            for all joints or one value per joint.
+
+    Returns:
+        list: One 1-D array of joint angles per joint.
+    """
+
+    steps = np.broadcast_to(steps, (len(joint_ranges),))
+    return [np.linspace(lo, hi, int(n)) for (lo, hi), n in zip(joint_ranges, steps)]
+
+
+def joint_grid_chunks(joint_ranges=JOINT_RANGES, steps=10, chunk_size=CHUNK_SIZE,
+                      start=0, stop=None):
+    """
+    Generate the joint vectors of a regular grid in chunks.
+
+    The grid is enumerated by its flattened index in C order, so the last
+    joint varies fastest, the same order as nested loops over the joints.
+
+    Args:
+        joint_ranges (np.ndarray): A 5x2 array of [min, max] joint angles.
+        steps (int or sequence): Number of samples per joint.
+        chunk_size (int): Maximum number of joint vectors per chunk.
+        start (int): First flattened grid index to generate.
+        stop (int, optional): Flattened grid index to stop at, defaults to
+            the size of the grid.
+
+    Yields:
+        tuple: The flattened index of the first sample and an (M, 5) array
+            of joint vectors.
+    """
+
+    axes = joint_grid_axes(joint_ranges, steps)
+    shape = tuple(len(axis) for axis in axes)
+    if stop is None:
+        stop = int(np.prod(shape))
+
+    for begin in range(start, stop, chunk_size):
+        index = np.arange(begin, min(begin + chunk_size, stop))
+        subscripts = np.unravel_index(index, shape)
+        gammas = np.column_stack([axis[sub] for axis, sub in zip(axes, subscripts)])
+        yield begin, gammas
+
+
+def random_joint_chunks(joint_ranges=JOINT_RANGES, num_samples=100000,
+                        chunk_size=CHUNK_SIZE, seed=None):
+    """
+    Generate uniformly distributed random joint vectors in chunks.
+
+    Args:
+        joint_ranges (np.ndarray): A 5x2 array of [min, max] joint angles.
+        num_samples (int): Total number of joint vectors.
+        chunk_size (int): Maximum number of joint vectors per chunk.
+        seed (int, optional): Seed of the random number generator.
+
+    Yields:
+        tuple: The index of the first sample and an (M, 5) array of joint vectors.
+    """
+
+    joint_ranges = np.asarray(joint_ranges, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    for begin in range(0, num_samples, chunk_size):
+        count = min(chunk_size, num_samples - begin)
+        gammas = rng.uniform(joint_ranges[:, 0], joint_ranges[:, 1],
+                             size=(count, len(joint_ranges)))
+        yield begin, gammas
+
+
+def workspace_bounds():
+    """
+    Calculate an axis aligned box that contains every end-effector position.
+
+    The end effector never leaves the sphere whose radius is the sum of the
+    link offsets d, so the box is the bounding cube of that sphere.
+
+    Returns:
+        np.ndarray: A 3x2 array of [min, max] bounds along x, y and z.
+    """
+
+    reach = float(np.sum(np.abs(robot_FK.DH_PARAMS[:, 2])))
+    return np.array([[-reach, reach]] * 3)
+
+
+def _sweep_chunks(joint_ranges, steps, num_samples, chunk_size, seed):
+    """
+    Select the grid or random chunk generator of a sweep.
+
+    Returns:
+        tuple: The total number of samples and the chunk generator.
+    """
+
+    if num_samples is None:
+        total = int(np.prod([len(axis) for axis in joint_grid_axes(joint_ranges, steps)]))
+        return total, joint_grid_chunks(joint_ranges, steps, chunk_size)
+    return int(num_samples), random_joint_chunks(joint_ranges, num_samples, chunk_size, seed)
+
+
+class _SharedBuffer:
+    """
+    Shared memory block that backs the array built from it with np.asarray.
+
+    The array keeps this object as its base, so the block stays mapped as
+    long as the array or any view of it is alive and is released with the
+    last of them. The array does not hold a buffer export of the block,
+    which would keep it from being closed.
+    """
+
+    def __init__(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        self.shm = shared_memory.SharedMemory(create=True,
+                                              size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        address = np.frombuffer(self.shm.buf, dtype=np.uint8).ctypes.data
+        self.__array_interface__ = {
+            'shape': tuple(shape),
+            'typestr': dtype.str,
+            'data': (address, False),
+            'version': 3,
+        }
+
+
+def _shared_empty(shape, dtype):
+    """
+    Allocate an uninitialized array in a shared memory block, the worker
+    processes attach to it by the name of positions.base.shm.
+    """
+
+    return np.asarray(_SharedBuffer(shape, dtype))
+
+
+def sample_workspace(joint_ranges=JOINT_RANGES, steps=10, num_samples=None,
+                     chunk_size=CHUNK_SIZE, out=None, path=None, dtype=np.float64,
+                     seed=None, workers=None):
+    """
+    Calculate the end-effector positions over a sweep of the joint space.
+
+    A regular grid is swept by default, passing num_samples switches to
+    uniform random sampling instead.
+
+    Args:
+        joint_ranges (np.ndarray): A 5x2 array of [min, max] joint angles.
+        steps (int or sequence): Number of grid samples per joint.
+        num_samples (int, optional): Number of random samples, replaces the grid.
+        chunk_size (int): Number of joint vectors evaluated per FK_batch call.
+        out (np.ndarray, optional): A preallocated (M, 3) array the positions
+            are written into.
+        path (str, optional): Stream the positions into a memory-mapped .npy
+            file at this path instead of memory.
+        dtype (np.dtype): Data type of the positions when out is not given.
+        seed (int, optional): Seed of the random number generator.
+        workers (int, optional): Split the sweep across this many processes,
+            0 uses one process per CPU core. Random samples are then drawn
+            from an independent stream per task, so they differ from a
+            single process run with the same seed. Without out and path the
+            returned array lives in the shared memory the workers wrote,
+            an out array is filled from a shared copy of the same size.
+
+    Returns:
+        np.ndarray: An (M, 3) array (or np.memmap) of end-effector positions.
+    """
+
+    total, chunks = _sweep_chunks(joint_ranges, steps, num_samples, chunk_size, seed)
+
+    if out is not None:
+        positions = out
+    elif path is not None:
+        positions = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(total, 3))
+    elif workers is not None:
+        positions = _shared_empty((total, 3), dtype)
+    else:
+        positions = np.empty((total, 3), dtype=dtype)
+
+    if positions.shape != (total, 3):
+        raise ValueError(f"Output must have shape {(total, 3)}, got {positions.shape}")
+
+    if workers is not None:
+        shared_path = path if out is None else None
+        _sample_workspace_parallel(positions, joint_ranges, steps, num_samples,
+                                   chunk_size, shared_path, seed, workers)
+        return positions
+
+    # Evaluate each chunk and store only the translation part of the pose
+    for begin, gammas in chunks:
+        T = FK_batch(gammas)
+        positions[begin:begin + len(gammas)] = T[:, :3, 3]
+
+    if isinstance(positions, np.memmap):
+        positions.flush()
+
+    return positions
+
+
+def workspace_histogram(joint_ranges=JOINT_RANGES, steps=10, num_samples=None,
+                        bins=64, bounds=None, chunk_size=CHUNK_SIZE, seed=None, workers=None):
+    """
+    Count the end-effector positions of a sweep in a 3-D histogram.
+
+    The positions are binned chunk by chunk and never stored, so the memory
+    use only depends on the number of bins, not on the number of samples.
+
+    Args:
+        joint_ranges (np.ndarray): A 5x2 array of [min, max] joint angles.
+        steps (int or sequence): Number of grid samples per joint.
+        num_samples (int, optional): Number of random samples, replaces the grid.
+        bins (int): Number of bins along each axis.
+        bounds (np.ndarray, optional): A 3x2 array of [min, max] bounds, defaults
+            to workspace_bounds().
+        chunk_size (int): Number of joint vectors evaluated per FK_batch call.
+        seed (int, optional): Seed of the random number generator.
+        workers (int, optional): Split the sweep across this many processes,
+            0 uses one process per CPU core, see sample_workspace.
+
+    Returns:
+        np.ndarray: A bins x bins x bins array of sample counts.
+        list: The bin edges along x, y and z.
+    """
+
+    bounds = workspace_bounds() if bounds is None else np.asarray(bounds, dtype=float)
+
+    # keep a degenerate (zero reach) workspace binnable
+    lo = np.minimum(bounds[:, 0], bounds[:, 1] - 1e-9)
+    edges = [np.linspace(lo[i], bounds[i, 1], bins + 1) for i in range(3)]
+
+    total, chunks = _sweep_chunks(joint_ranges, steps, num_samples, chunk_size, seed)
+    if workers is not None:
+        # every worker bins its ranges, only the counts travel back
+        workers = workers or os.cpu_count()
+        bounds, seeds = _split_sweep(total, chunk_size, seed, workers)
+        tasks = [{
+            'joint_ranges': np.asarray(joint_ranges, dtype=float),
+            'steps': steps,
+            'num_samples': num_samples,
+            'chunk_size': chunk_size,
+            'seed': task_seed,
+            'start': start,
+            'stop': stop,
+            'edges': edges,
+        } for (start, stop), task_seed in zip(bounds, seeds)]
+        counts = np.zeros((bins, bins, bins), dtype=np.int64)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for hist in pool.map(_histogram_task, tasks):
+                counts += hist
+        return counts, edges
+
+    return _bin_chunks(chunks, edges), edges
+
+
+def _bin_chunks(chunks, edges):
+    # Count the end-effector positions of every chunk in the bins given by edges
+    counts = np.zeros(tuple(len(edge) - 1 for edge in edges), dtype=np.int64)
+    for _, gammas in chunks:
+        hist, _ = np.histogramdd(FK_batch(gammas)[:, :3, 3], bins=edges)
+        counts += hist.astype(np.int64)
+    return counts
+
+
+def _split_sweep(total, chunk_size, seed, workers):
+    """
+    Cut a sweep into the tasks of a process pool.
+
+    The flattened sample index is cut into contiguous ranges of whole
+    chunks, about four per worker to balance the load.
+
+    Returns:
+        list: The [start, stop) sample range of every task.
+        list: An independent np.random.SeedSequence per task.
+    """
+
+    task_size = max(chunk_size, -(-total // (4 * workers)) // chunk_size * chunk_size)
+    bounds = [(start, min(start + task_size, total)) for start in range(0, total, task_size)]
+    return bounds, np.random.SeedSequence(seed).spawn(len(bounds))
+
+
+def _task_chunks(task):
+    # The chunks of the [start, stop) range of a task, indexed over the whole sweep
+    start, stop = task['start'], task['stop']
+    if task['num_samples'] is None:
+        return joint_grid_chunks(task['joint_ranges'], task['steps'],
+                                 task['chunk_size'], start, stop)
+    return ((start + begin, gammas) for begin, gammas in random_joint_chunks(
+        task['joint_ranges'], stop - start, task['chunk_size'], task['seed']))
+
+
+def _histogram_task(task):
+    """
+    Bin one range of a workspace sweep inside a worker process.
+
+    Args:
+        task (dict): The sweep settings, the [start, stop) sample range and
+            the bin edges.
+
+    Returns:
+        np.ndarray: The sample counts of the range.
+    """
+
+    return _bin_chunks(_task_chunks(task), task['edges'])
+
+
+def _sweep_task(task):
+    """
+    Evaluate one range of a workspace sweep inside a worker process.
+
+    Args:
+        task (dict): The sweep settings, the [start, stop) sample range and
+            where the shared result array lives.
+
+    Returns:
+        int: Number of positions written.
+    """
+
+    shape = (task['total'], 3)
+    if task['path'] is not None:
+        shm = None
+        positions = np.load(task['path'], mmap_mode='r+')
+    else:
+        shm = shared_memory.SharedMemory(name=task['shm_name'])
+        positions = np.ndarray(shape, dtype=task['dtype'], buffer=shm.buf)
+
+    for begin, gammas in _task_chunks(task):
+        positions[begin:begin + len(gammas)] = FK_batch(gammas)[:, :3, 3]
+
+    if shm is None:
+        positions.flush()
+    else:
+        del positions
+        shm.close()
+
+    return task['stop'] - task['start']
+
+
+def _sample_workspace_parallel(positions, joint_ranges, steps, num_samples,
+                               chunk_size, path, seed, workers):
+    """
+    Fill positions with a workspace sweep split across a process pool.
+
+    Each worker writes its ranges of the sweep directly into the
+    memory-mapped file at path, or into the shared memory block that backs
+    positions, so no results are pickled. Any other positions array is
+    filled from a shared block of the same size once all workers finished.
+    """
+
+    workers = workers or os.cpu_count()
+    total = len(positions)
+    dtype = positions.dtype
+    bounds, seeds = _split_sweep(total, chunk_size, seed, workers)
+
+    shared = None
+    if path is not None:
+        positions.flush()
+    elif isinstance(positions.base, _SharedBuffer):
+        shared = positions
+    else:
+        shared = _shared_empty(positions.shape, dtype)
+    shm = None if shared is None else shared.base.shm
+
+    try:
+        tasks = [{
+            'joint_ranges': np.asarray(joint_ranges, dtype=float),
+            'steps': steps,
+            'num_samples': num_samples,
+            'chunk_size': chunk_size,
+            'seed': task_seed,
+            'start': start,
+            'stop': stop,
+            'total': total,
+            'dtype': dtype.str,
+            'path': path,
+            'shm_name': None if shm is None else shm.name,
+        } for (start, stop), task_seed in zip(bounds, seeds)]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # consume the results so worker exceptions are raised here
+            for _ in pool.map(_sweep_task, tasks):
+                pass
+
+        if shared is not None and shared is not positions:
+            positions[...] = shared
+    finally:
+        # the block stays mapped here until the last array using it is gone
+        if shm is not None:
+            shm.unlink()
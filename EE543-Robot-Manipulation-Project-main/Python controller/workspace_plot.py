@@ -1,49 +1,155 @@
+import warnings
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
-from robot_FK import FK
-
-def plot_workspace():
-    # Define the range of joint angles (in radians)
-    joint_ranges = [
-        np.linspace(0, 2*np.pi, 10),  # Joint 1
-        np.linspace(-np.pi/2, np.pi/2, 10),  # Joint 2
-        np.linspace(-np.pi/2, np.pi/2, 10),  # Joint 3
-        np.linspace(-np.pi/2, np.pi/2, 10),  # Joint 4
-        np.linspace(-np.pi/2, np.pi/2, 10)   # Joint 5 (Gripper)
-    ]
-
-    # Initialize lists to store the end-effector positions
-    x_coords, y_coords, z_coords = [], [], []
-
-    # Iterate through all combinations of joint angles
-    for theta1 in joint_ranges[0]:
-        for theta2 in joint_ranges[1]:
-            for theta3 in joint_ranges[2]:
-                for theta4 in joint_ranges[3]:
-                    for theta5 in joint_ranges[4]:
-                        # Calculate the forward kinematics
-                        gamma = [theta1, theta2, theta3, theta4, theta5]
-                        T, _ = FK(gamma)
-                        
-                        # Extract the end-effector position
-                        x_coords.append(T[0, 3])
-                        y_coords.append(T[1, 3])
-                        z_coords.append(T[2, 3])
+from workspace_analysis import JOINT_RANGES, sample_workspace, workspace_histogram
+
+# scipy is only needed for the convex hull rendering
+try:
+    from scipy.spatial import ConvexHull, QhullError
+except ImportError:
+    ConvexHull = None
+
+def plot_workspace(joint_ranges=JOINT_RANGES, steps=10, num_samples=None, path=None, workers=None,
+                   mode='scatter', bins=64, max_points=100000, max_voxels=20000):
+    # Rendering modes, the cost of every mode except 'scatter' only depends on bins
+    #   'scatter':    every end-effector position, decimated to max_points
+    #   'voxel':      occupied bins on the surface of the workspace, colored by sample
+    #                 density, the bins are merged until at most max_voxels are drawn
+    #   'projection': 2D density histograms on the XY, XZ and YZ planes
+    #   'hull':       convex hull surface of the occupied bins (requires scipy),
+    #                 falls back to 'projection' when the bins span no volume
+    # set workers to split the sweep across a process pool (0 = all CPU cores) in every mode,
+    # path stores the positions in a memory-mapped .npy file, only 'scatter' keeps them
+    if mode == 'scatter':
+        # Calculate the end-effector positions over the whole joint space grid
+        # (or over num_samples random joint vectors), chunk by chunk with batched FK
+        positions = sample_workspace(joint_ranges, steps, num_samples=num_samples,
+                                     path=path, workers=workers)
+        plot_scatter(positions, max_points)
+    elif mode in ('voxel', 'projection', 'hull'):
+        # Bin the positions while sweeping, they are never stored
+        if path is not None:
+            raise ValueError(f"path is only used by the 'scatter' mode, the '{mode}' mode stores no positions")
+        counts, edges = workspace_histogram(joint_ranges, steps, num_samples=num_samples,
+                                            bins=bins, workers=workers)
+        if mode == 'voxel':
+            plot_voxels(counts, edges, max_voxels)
+        elif mode == 'projection':
+            plot_projections(counts, edges)
+        else:
+            plot_hull(counts, edges)
+    else:
+        raise ValueError(f"Unknown rendering mode '{mode}'")
+
+    # Show the plot
+    plt.show()
+
+def plot_scatter(positions, max_points=100000):
+    # Draw a random subset when there are more points than matplotlib handles
+    if len(positions) > max_points:
+        keep = np.sort(np.random.default_rng(0).choice(len(positions), max_points, replace=False))
+        positions = positions[keep]
 
     # Create a 3D plot
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
-    ax.scatter(x_coords, y_coords, z_coords, c='b', marker='o')
+    ax.scatter(positions[:, 0], positions[:, 1], positions[:, 2], c='b', marker='o')
+    set_labels(ax)
+    return ax
+
+def coarsen_histogram(counts, edges, max_bins):
+    # Merge blocks of neighbouring bins until every axis has at most max_bins bins
+    factors = [-(-n // max_bins) for n in counts.shape]
+    if max(factors) == 1:
+        return counts, edges
+
+    # pad every axis to a multiple of its factor, then sum the blocks
+    padded = np.pad(counts, [(0, -n % f) for n, f in zip(counts.shape, factors)])
+    shape = []
+    for n, f in zip(padded.shape, factors):
+        shape += [n // f, f]
+    coarse = padded.reshape(shape).sum(axis=(1, 3, 5))
+
+    coarse_edges = []
+    for edge, f, n in zip(edges, factors, coarse.shape):
+        step = (edge[1] - edge[0]) * f
+        coarse_edges.append(edge[0] + step * np.arange(n + 1))
+    return coarse, coarse_edges
+
+def surface_bins(counts):
+    # Occupied bins with at least one empty neighbour, the interior ones are hidden anyway
+    filled = np.pad(counts > 0, 1)
+    interior = filled[1:-1, 1:-1, 1:-1].copy()
+    for axis in range(3):
+        for shift in (-1, 1):
+            interior &= np.roll(filled, shift, axis=axis)[1:-1, 1:-1, 1:-1]
+    return (counts > 0) & ~interior
+
+def plot_voxels(counts, edges, max_voxels=20000):
+    # Draw one marker per occupied surface bin, colored by the log of its sample count,
+    # halve the resolution until the marker count is bounded
+    surface = surface_bins(counts)
+    while np.count_nonzero(surface) > max_voxels and max(counts.shape) > 1:
+        counts, edges = coarsen_histogram(counts, edges, -(-max(counts.shape) // 2))
+        surface = surface_bins(counts)
+
+    centers = [(edge[:-1] + edge[1:]) / 2 for edge in edges]
+    i, j, k = np.nonzero(surface)
+
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection='3d')
+    points = ax.scatter(centers[0][i], centers[1][j], centers[2][k],
+                        c=np.log10(counts[i, j, k]), cmap='viridis', marker='s')
+    fig.colorbar(points, ax=ax, label='log10(samples per voxel)')
+    set_labels(ax)
+    return ax
+
+def plot_projections(counts, edges):
+    # Sum the 3D histogram along each axis to get the three plane projections
+    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+    planes = [('X', 'Y', 2), ('X', 'Z', 1), ('Y', 'Z', 0)]
+    for ax, (horizontal, vertical, summed_axis) in zip(axes, planes):
+        h, v = [i for i in range(3) if i != summed_axis]
+        density = counts.sum(axis=summed_axis).T
+        image = ax.imshow(np.log10(density + 1), origin='lower', cmap='viridis', aspect='equal',
+                          extent=(edges[h][0], edges[h][-1], edges[v][0], edges[v][-1]))
+        ax.set_xlabel(horizontal)
+        ax.set_ylabel(vertical)
+        ax.set_title(f'{horizontal}{vertical} projection')
+    fig.colorbar(image, ax=axes, label='log10(samples + 1)')
+    fig.suptitle('Reachable Workspace of the Robot')
+    return axes
+
+def plot_hull(counts, edges):
+    if ConvexHull is None:
+        raise ImportError("The 'hull' rendering mode requires scipy")
+
+    # The hull of the occupied bin centers encloses the sampled workspace
+    centers = [(edge[:-1] + edge[1:]) / 2 for edge in edges]
+    i, j, k = np.nonzero(counts)
+    points = np.column_stack((centers[0][i], centers[1][j], centers[2][k]))
+    try:
+        hull = ConvexHull(points)
+    except (QhullError, ValueError) as error:
+        # fewer than 4 bins, or all of them on a plane or a line, have no 3D hull
+        warnings.warn(f"The workspace has no 3D convex hull, plotting projections instead ({str(error).splitlines()[0]})")
+        return plot_projections(counts, edges)
+
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection='3d')
+    ax.plot_trisurf(points[:, 0], points[:, 1], points[:, 2], triangles=hull.simplices,
+                    color='b', alpha=0.3, edgecolor='k', linewidth=0.2)
+    set_labels(ax)
+    return ax
 
+def set_labels(ax):
     # Set plot labels
     ax.set_xlabel('X')
     ax.set_ylabel('Y')
     ax.set_zlabel('Z')
     ax.set_title('Reachable Workspace of the Robot')
 
-    # Show the plot
-    plt.show()
-
-# Call the function to plot the workspace
-plot_workspace()
\ No newline at end of file
+if __name__ == "__main__":
+    # Call the function to plot the workspace
+    plot_workspace()